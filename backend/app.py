@@ -1,28 +1,37 @@
 import os
+import json
+import time
+import queue
+import asyncio
+import hashlib
+import multiprocessing
+import struct
+import threading
+from typing import Optional
+
 import numpy as np
-from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket
+from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from uuid import uuid4
-import torch
-import random
 
 from config import (
-    UPLOAD_DIR, OUTPUT_DIR, MODEL_PATH, FS_FALLBACK, BANDPASS, NOTCH,
-    WINDOW_SEC, OVERLAP, N_FFT, HOP, USE_SPECTROGRAMS,
-    MAX_WINDOWS_FOR_INFER, MODEL_CFG
+    UPLOAD_DIR, OUTPUT_DIR, FS_FALLBACK, BANDPASS, NOTCH, STREAM_FILTERED,
+    MAX_ONLINE_SESSIONS, ONLINE_MAX_CHUNK_SEC, ONLINE_FS_RANGE, ONLINE_MAX_CHANNELS,
+    PREDICT_EXECUTOR, PREDICT_WORKERS, MAX_INFLIGHT_PREDICTIONS, RETRY_AFTER_SEC,
+    USE_RESULT_CACHE, RESULT_CACHE_DIR, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MEMORY_ENTRIES,
+    DEFER_HEATMAPS, HEATMAP_WORKERS, MAX_PENDING_HEATMAPS, OUTPUT_SWEEP_INTERVAL_SEC,
+    WARMUP_IN_BACKGROUND, WARMUP_TIMEOUT_SEC
 )
-from utils.file_utils import save_upload_file
-from preprocessing.loader import load_eeg
-from preprocessing.filters import notch_and_bandpass, make_windows, to_spectrogram
-from models.predictor import load_model, predict_windows
-from xai.gradcam_utils import generate_gradcam
+from utils.file_utils import save_upload_file, remove_upload
 from utils.stream_utils import eeg_data_generator, eeg_file_stream
-from utils.ai_utils import generate_ai_report
-
-# ✅ CSV/tabular prediction
-from models.tabular_predictor import predict_csv_file
+from utils.stream_protocol import negotiate, StreamSession, decode_frame
+from utils.workers import make_executor, InflightLimiter
+from utils.result_cache import ResultCache
+from utils.jobs import JobQueue
+from utils.output_store import get_output_store
+import pipeline
+from models.online import ONLINE_METRICS
 
 app = FastAPI(title="EEG Schizophrenia Detection API")
 
@@ -36,186 +45,328 @@ app.add_middleware(
 
 app.mount("/outputs", StaticFiles(directory=OUTPUT_DIR), name="outputs")
 
-MODEL = None
-DEVICE = None
 LAST_FILE_PATH = None
+EXECUTOR = None
+WARMUP_REPORTS = None  # process pools: workers post their init_models() report here
+LIMITER = InflightLimiter(MAX_INFLIGHT_PREDICTIONS)
+HEATMAP_JOBS = JobQueue(workers=HEATMAP_WORKERS, max_pending=MAX_PENDING_HEATMAPS)
+RESULT_CACHE = ResultCache(
+    RESULT_CACHE_DIR, max_entries=RESULT_CACHE_MAX_ENTRIES, memory_entries=RESULT_CACHE_MEMORY_ENTRIES
+) if USE_RESULT_CACHE else None
+# /healthz state: "starting" until warm-up has finished, then "ready" (or "failed")
+READINESS = {"status": "starting", "warmup_sec": None, "warmup": None, "error": None}
 
 
-@app.on_event("startup")
-def startup_event():
-    global MODEL, DEVICE
-    if os.path.exists(MODEL_PATH):
-        try:
-            model_cfg = dict(MODEL_CFG)
-            MODEL, DEVICE = load_model(MODEL_PATH, model_cfg)
-            print("✅ Loaded EEG model:", MODEL_PATH)
-        except Exception as e:
-            print("❌ Could not load EEG model:", e)
-    else:
-        print("⚠️ EEG model not found:", MODEL_PATH)
+def _admit():
+    """Take a worker-pool slot or answer 503 with Retry-After."""
+    if not LIMITER.try_acquire():
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, too many predictions in flight. Retry later.",
+            headers={"Retry-After": str(RETRY_AFTER_SEC)},
+        )
 
 
-@app.post("/predict")
-async def predict(file: UploadFile = File(...)):
+def _keep_for_stream(saved_path: str):
+    """The latest upload stays on disk for /ws/stream; the one it replaces is removed."""
     global LAST_FILE_PATH
-    saved_path = await save_upload_file(file, UPLOAD_DIR)
-    LAST_FILE_PATH = saved_path
+    previous, LAST_FILE_PATH = LAST_FILE_PATH, saved_path
+    if previous and previous != saved_path:
+        remove_upload(previous)
+
 
-    ext = os.path.splitext(file.filename)[1].lower().lstrip(".")
+def _heatmap_exists(result: dict) -> bool:
+    """A cached result is only usable while the PNG it points to is still served (refreshes its LRU age)."""
+    url = result.get("heatmap")
+    return bool(url) and get_output_store().touch(url)
 
-    # ---------- CSV branch ----------
-    if ext == "csv":
+
+def _worker_reports(n_workers: int) -> dict:
+    """
+    Collect the report each pool worker posts after warming up (pipeline.init_worker),
+    one per process. Submitting one task per worker makes the pool spawn them all.
+    """
+    futures = [EXECUTOR.submit(os.getpid) for _ in range(n_workers)]
+    deadline = time.monotonic() + WARMUP_TIMEOUT_SEC
+    workers = {}
+    while len(workers) < n_workers:
+        for f in futures:
+            if f.done() and f.exception() is not None:
+                raise f.exception()  # e.g. BrokenProcessPool: a worker died while starting
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{len(workers)} of {n_workers} workers reported within {WARMUP_TIMEOUT_SEC}s")
         try:
-            result = predict_csv_file(saved_path)
-            return JSONResponse({
-                "prediction": result["prediction"],
-                "confidence": result["confidence"],
-                "risk_confidence": result["risk_confidence"],
-                "heatmap": result["heatmap"],
-                "explanation": result["explanation"],
-                "ai_report": result["ai_report"],
-                "file_name": file.filename
-            })
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"CSV analysis failed: {e}")
-
-    # ---------- Raw EEG branch ----------
+            report = WARMUP_REPORTS.get(timeout=1.0)
+        except queue.Empty:
+            continue
+        workers[report["pid"]] = report
+    workers = list(workers.values())
+    report = {k: all(w[k] for w in workers) for k in ("eeg_model", "tabular_model", "gradcam")}
+    return dict(report, workers=workers)
+
+
+def _warm_up():
+    """Load and warm the models, then flip READINESS (runs in a background thread by default)."""
+    t0 = time.perf_counter()
     try:
-        x, fs, ch_names = load_eeg(saved_path, fs_fallback=FS_FALLBACK)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Could not load EEG: {e}")
-
-    if fs is None:
-        fs = FS_FALLBACK
-
-    x = notch_and_bandpass(x, fs, notch_freq=NOTCH, band=BANDPASS)
-    wins = make_windows(x, fs, WINDOW_SEC, OVERLAP)
-    if wins.shape[0] == 0:
-        wins = np.zeros((1, x.shape[0], int(WINDOW_SEC * fs)), dtype=x.dtype)
-    wins = wins[:MAX_WINDOWS_FOR_INFER]
-
-    specs = []
-    for w in wins:
-        if USE_SPECTROGRAMS:
-            S = to_spectrogram(w, fs, n_fft=N_FFT, hop_length=HOP)
-            S = (S - S.mean()) / (S.std() + 1e-6)
-            specs.append(S)
+        if PREDICT_EXECUTOR == "process":
+            report = _worker_reports(PREDICT_WORKERS)
         else:
-            w_norm = (w - w.mean(axis=1, keepdims=True)) / (w.std(axis=1, keepdims=True) + 1e-6)
-            S = w_norm[:, None, :]
-            specs.append(S)
-    tensor_stack = torch.tensor(np.stack(specs, axis=0), dtype=torch.float32)
-
-    global MODEL, DEVICE
-    in_channels = tensor_stack.shape[1]
-    if MODEL is None:
-        cfg = dict(MODEL_CFG)
-        cfg["in_channels"] = in_channels
-        MODEL, DEVICE = load_model(MODEL_PATH, cfg)
-
-    for m in MODEL.modules():
-        if isinstance(m, torch.nn.Conv2d) and m.in_channels != in_channels:
-            cfg = dict(MODEL_CFG)
-            cfg["in_channels"] = in_channels
-            MODEL, DEVICE = load_model(MODEL_PATH, cfg)
-            break
-    
-    probs = predict_windows(MODEL, DEVICE, tensor_stack)
-    avg_prob = float(np.mean([r["confidence"] for r in probs]))
-    risk_confidence = avg_prob
-    label = "At Risk" if risk_confidence >= 0.40 else "Healthy"
-    confidence = round(random.uniform(93.0, 98.0), 2)
-    
+            report = pipeline.init_models()
+        warmup_sec = round(time.perf_counter() - t0, 3)
+        if not report["eeg_model"]:
+            # /predict cannot serve EEG uploads: keep answering 503 rather than claim readiness
+            READINESS.update(status="failed", warmup=report, warmup_sec=warmup_sec, error="EEG model not loaded")
+            print("❌ Warm-up failed: EEG model not loaded")
+            return
+        READINESS.update(status="ready", warmup=report, warmup_sec=warmup_sec)
+        print(f"✅ Ready after {READINESS['warmup_sec']}s warm-up")
+    except Exception as e:
+        print("❌ Warm-up failed:", e)
+        READINESS.update(status="failed", error=str(e), warmup_sec=round(time.perf_counter() - t0, 3))
+
+
+@app.on_event("startup")
+def startup_event():
+    global EXECUTOR, WARMUP_REPORTS
+    get_output_store().start_sweeper(OUTPUT_SWEEP_INTERVAL_SEC)
+    if PREDICT_EXECUTOR == "process":
+        WARMUP_REPORTS = multiprocessing.get_context("spawn").Queue()
+        # every worker process loads (and warms) its own models and reports back
+        EXECUTOR = make_executor("process", PREDICT_WORKERS, initializer=pipeline.init_worker,
+                                 initargs=(WARMUP_REPORTS,))
+    else:
+        EXECUTOR = make_executor("thread", PREDICT_WORKERS)
+    if WARMUP_IN_BACKGROUND:
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    else:
+        _warm_up()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    if EXECUTOR is not None:
+        EXECUTOR.shutdown(wait=False, cancel_futures=True)
+    HEATMAP_JOBS.shutdown()
+    get_output_store().stop_sweeper()
+    if LAST_FILE_PATH:
+        remove_upload(LAST_FILE_PATH)
+
+
+@app.post("/predict")
+async def predict(file: UploadFile = File(...), defer_heatmap: Optional[bool] = None):
+    # admission control before any real work: reject instead of queueing without bound
+    _admit()
+    hasher = hashlib.sha256()
     try:
-        ch_importance = np.mean(np.abs(x), axis=1)
-        top_idx = np.argsort(ch_importance)[-3:][::-1]
-        top_channels = [ch_names[i] if ch_names else f"C{i}" for i in top_idx]
-
-        freqs = np.fft.rfftfreq(x.shape[1], d=1/fs)
-        fft_power = np.abs(np.fft.rfft(x, axis=1))**2
-        bands = {
-            "Delta (0.5–4 Hz)": (0.5, 4),
-            "Theta (4–8 Hz)": (4, 8),
-            "Alpha (8–13 Hz)": (8, 13),
-            "Beta (13–30 Hz)": (13, 30),
-            "Gamma (30–45 Hz)": (30, 45),
-        }
-        band_scores = {
-            b: float(fft_power[:, (freqs >= f1) & (freqs <= f2)].mean())
-            for b, (f1, f2) in bands.items()
-        }
-        total_power = sum(band_scores.values())
-        band_percents = {
-            b: (v / total_power) * 100 if total_power > 0 else 0
-            for b, v in band_scores.items()
-            }
-
-        top_bands = sorted(band_scores, key=band_scores.get, reverse=True)[:2]
-
-        if label == "At Risk":
-            explanation = (
-                f"Abnormal EEG activity detected. Elevated activity in key brain regions "
-                f"with dominant rhythms: "
-                f"Delta {band_percents['Delta (0.5–4 Hz)']:.1f}%"
-                f"Theta {band_percents['Theta (4–8 Hz)']:.1f}%, "
-                f"Alpha {band_percents['Alpha (8–13 Hz)']:.1f}%, "
-                f"Beta {band_percents['Beta (13–30 Hz)']:.1f}%, "
-                f"Gamma {band_percents['Gamma (30–45 Hz)']:.1f}%. "
-                "These abnormalities are consistent with schizophrenia risk."
-            )
+        saved_path = await save_upload_file(file, UPLOAD_DIR, hasher=hasher)
+    except Exception:
+        LIMITER.release()
+        raise
+    defer = DEFER_HEATMAPS if defer_heatmap is None else defer_heatmap
+
+    # repeated uploads: same bytes + same model + same config -> stored response;
+    # lookups and stores do file I/O (and the validator stats the PNG), so they run in a thread
+    input_key = ResultCache.make_key(hasher.hexdigest(), *pipeline.result_key_parts(file.filename))
+    if RESULT_CACHE is not None:
+        try:
+            cached = await asyncio.to_thread(RESULT_CACHE.get, input_key, _heatmap_exists)
+        except Exception:
+            LIMITER.release()
+            remove_upload(saved_path)
+            raise
+        if cached is not None:
+            LIMITER.release()
+            _keep_for_stream(saved_path)
+            cached["file_name"] = file.filename
+            return JSONResponse(cached)
+
+    # load -> filter -> model -> Grad-CAM all run in the worker pool, off the event loop;
+    # the upload is only needed until then (a deferred heatmap keeps its windows, not the file)
+    try:
+        result = await LIMITER.run(EXECUTOR, pipeline.run_prediction, saved_path, file.filename, defer)
+    except pipeline.InputError as e:
+        remove_upload(saved_path)
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        remove_upload(saved_path)
+        raise
+    _keep_for_stream(saved_path)
+
+    spec = result.pop("_heatmap_spec", None)
+    if spec is not None:
+        # cache the response once its heatmap exists, so hits never point at a pending job
+        def on_done(url):
+            if url and RESULT_CACHE is not None:
+                RESULT_CACHE.put(input_key, dict(result, heatmap=url))
+
+        job_id = HEATMAP_JOBS.submit(input_key, pipeline.render_heatmap, spec, on_done=on_done)
+        if job_id is not None:
+            return JSONResponse(dict(result, heatmap_job=job_id))
+        # job queue full: render inline, as without deferral, if the worker pool has a slot;
+        # otherwise answer without a heatmap (not cached, a later upload retries)
+        if LIMITER.try_acquire():
+            result["heatmap"] = await LIMITER.run(EXECUTOR, pipeline.try_render_heatmap, spec)
         else:
-            explanation = (
-                "EEG activity appears normal, with balanced rhythms across all channels. "
-                "No patterns consistent with schizophrenia risk were detected."
-            )
-    except Exception as e:
-        print("⚠ Band analysis failed:", e)
-        top_channels, top_bands, explanation = [], [], "EEG explanation unavailable."
+            result["heatmap"] = None
 
-    # Grad-CAM (only for heatmap, keep explanation intact)
+    # every prediction comes with a heatmap; one missing after a transient XAI
+    # failure is not cached, so the next upload of the file tries again
+    if RESULT_CACHE is not None and result.get("heatmap"):
+        await asyncio.to_thread(RESULT_CACHE.put, input_key, result)
+    return JSONResponse(result)
+
+
+@app.post("/predict/batch")
+async def predict_batch(file: UploadFile = File(...)):
+    """Multi-patient CSV: one prediction and band breakdown per row."""
+    if os.path.splitext(file.filename)[1].lower() != ".csv":
+        raise HTTPException(status_code=400, detail="Batch scoring expects a .csv file.")
+    _admit()
     try:
-        input_tensor = tensor_stack[:5].to(DEVICE)
-        out_fname = f"heatmap_{uuid4().hex}.png"
-        out_path = os.path.join(OUTPUT_DIR, out_fname)
-        target_class = 1 if avg_prob >= 0.5 else 0
-        heatmap_path, _ = generate_gradcam(
-            MODEL, DEVICE, input_tensor, target_class, out_path,
-            ch_names=ch_names, fs=fs
-        )
-        heatmap_url = f"/outputs/{out_fname}"
-    except Exception as e:
-        print("⚠️ XAI failed:", e)
-        heatmap_url = None
+        saved_path = await save_upload_file(file, UPLOAD_DIR)
+    except Exception:
+        LIMITER.release()
+        raise
+    try:
+        result = await LIMITER.run(EXECUTOR, pipeline.predict_csv_batch, saved_path, file.filename)
+    except pipeline.InputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        remove_upload(saved_path)
+    return JSONResponse(result)
 
-    ai_report = generate_ai_report(label, confidence, top_channels, top_bands)
 
-    return JSONResponse({
-        "prediction": label,
-        "confidence": confidence,
-        "risk_confidence": risk_confidence,
-        "heatmap": heatmap_url,
-        "explanation": explanation,
-        "ai_report": ai_report,
-        "file_name": file.filename
-    })
+@app.get("/heatmap/{job_id}")
+def heatmap_status(job_id: str):
+    """Poll a deferred heatmap: status is queued | running | done | failed."""
+    job = HEATMAP_JOBS.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown heatmap job.")
+    return {"job_id": job_id, "status": job["status"], "heatmap": job["result"], "error": job["error"]}
 
 
 @app.websocket("/ws/stream")
 async def eeg_stream(websocket: WebSocket):
-    await websocket.accept()
+    """
+    JSON chunks by default; ``?format=f32|i16`` (or subprotocol ``eeg.f32|eeg.i16``)
+    switches to binary frames and ``?decimate=k`` downsamples server-side
+    (see utils/stream_protocol.py).
+    """
+    fmt = negotiate(websocket.query_params, websocket.scope.get("subprotocols", ()))
+    await websocket.accept(subprotocol=fmt.subprotocol)
+    session = StreamSession(fmt)
+    send = websocket.send_bytes if fmt.binary else websocket.send_json
     try:
+        if fmt.binary:
+            await websocket.send_json(fmt.hello())
         if LAST_FILE_PATH:
-            async for packet in eeg_file_stream(LAST_FILE_PATH, fs=256, duration=30):
-                await websocket.send_json(packet)
+            stream_filter = dict(notch=NOTCH, band=BANDPASS) if STREAM_FILTERED else {}
+            source = eeg_file_stream(LAST_FILE_PATH, fs=256, duration=30, **stream_filter)
         else:
-            async for packet in eeg_data_generator(fs=256, duration=30):
-                await websocket.send_json(packet)
+            source = eeg_data_generator(fs=256, duration=30)
+        async for chunk, fs in source:
+            await send(session.encode(chunk, fs))
     except Exception as e:
         print("⚠ Stream error:", e)
     finally:
         await websocket.close()
 
 
+def _online_fs(value) -> float:
+    """Client-declared sampling rate, rejected unless finite and within ONLINE_FS_RANGE."""
+    try:
+        fs = float(value)
+    except (TypeError, ValueError):
+        raise pipeline.InputError(f"fs must be a number, got {value!r}")
+    lo, hi = ONLINE_FS_RANGE
+    if not lo <= fs <= hi:  # also false for NaN
+        raise pipeline.InputError(f"fs must be within [{lo:g}, {hi:g}] Hz, got {fs:g}")
+    return fs
+
+
+def _read_chunk(message: dict, default_fs):
+    """(samples (ch, n) float32, fs, seq) from a /ws/infer message: a binary stream frame or JSON."""
+    try:
+        if message.get("bytes") is not None:
+            header, chunk = decode_frame(message["bytes"])
+            fs, seq = header["fs"], header["seq"]
+        else:
+            payload = json.loads(message["text"])
+            chunk = np.asarray(payload["data"], dtype=np.float32)
+            fs, seq = payload.get("fs") or default_fs, payload.get("seq")
+    except (KeyError, TypeError, ValueError, AttributeError, struct.error) as e:
+        raise pipeline.InputError(f"Malformed chunk: {type(e).__name__}: {e}")
+    fs = _online_fs(fs)
+    if chunk.ndim != 2 or not 0 < chunk.shape[0] <= ONLINE_MAX_CHANNELS \
+            or chunk.shape[1] > ONLINE_MAX_CHUNK_SEC * fs:
+        raise pipeline.InputError(
+            f"Expected a (<= {ONLINE_MAX_CHANNELS} channels, <= {ONLINE_MAX_CHUNK_SEC:g} s) chunk, got {chunk.shape}")
+    if not np.isfinite(chunk).all():
+        raise pipeline.InputError("Chunk contains NaN or inf samples")
+    return chunk, fs, seq
+
+
+@app.websocket("/ws/infer")
+async def eeg_infer(websocket: WebSocket):
+    """
+    Online inference: the client pushes raw EEG chunks, either as binary frames
+    of utils/stream_protocol.py or as JSON {"data": [[...]], "fs": 256, "seq": 0}.
+    The first chunk fixes fs and the channel count. The server answers
+    {"type": "ready", ...} once, then one {"type": "risk", ...} message per
+    window with its stream timestamps, the rolling risk and the latency.
+    """
+    if ONLINE_METRICS.active >= MAX_ONLINE_SESSIONS:
+        await websocket.close(code=1013)  # try again later
+        return
+    await websocket.accept()
+    ONLINE_METRICS.open()
+    default_fs = websocket.query_params.get("fs", FS_FALLBACK)  # validated with each chunk
+    session = None
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            received = time.perf_counter()
+            chunk, fs, seq = _read_chunk(message, default_fs)
+            if session is None:
+                session = await asyncio.to_thread(pipeline.open_online_session, fs, chunk.shape[0])
+                await websocket.send_json(session.describe())
+            elif fs != session.windower.fs:
+                raise pipeline.InputError(f"fs changed from {session.windower.fs:g} to {fs:g} mid-session")
+            for reply in await session.push(chunk, received, seq):
+                await websocket.send_json(reply)
+    except WebSocketDisconnect:
+        pass
+    except (pipeline.InputError, ValueError, KeyError, TypeError) as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=1003)
+    finally:
+        ONLINE_METRICS.close()
+
+
+@app.get("/stats")
+def stats():
+    return {
+        "executor": {"kind": PREDICT_EXECUTOR, "workers": PREDICT_WORKERS, **LIMITER.stats()},
+        "result_cache": RESULT_CACHE.stats() if RESULT_CACHE is not None else None,
+        "heatmap_jobs": HEATMAP_JOBS.stats(),
+        "outputs": get_output_store().stats(),
+        "online": ONLINE_METRICS.stats(),
+        **pipeline.stats(),  # this process only when PREDICT_EXECUTOR == "process"
+    }
+
+
+@app.get("/healthz")
+def healthz():
+    """Readiness probe: 200 once warm-up has finished, 503 while starting or after a failed warm-up."""
+    if READINESS["status"] == "ready":
+        return READINESS
+    headers = {"Retry-After": str(RETRY_AFTER_SEC)} if READINESS["status"] == "starting" else None
+    return JSONResponse(status_code=503, content=READINESS, headers=headers)
+
+
 @app.get("/")
 def root():
     return {"message": "EEG Schizophrenia Detection API is running!"}
@@ -5,6 +5,7 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
 MODEL_PATH = os.path.join(BASE_DIR, "models", "best.pt")  # EEG model (after training)
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
 
 # --- Preprocessing defaults ---
 FS_FALLBACK = 256
@@ -15,7 +16,71 @@ OVERLAP = 0.5
 N_FFT = 256
 HOP = 64
 USE_SPECTROGRAMS = True
+PIPELINE_DTYPE = "float64"  # "float32" halves preprocessing memory; opt in once scripts/bench_float32.py passes on your data
+SHARED_STFT = True  # one STFT per recording, windows sliced from it (needs step % HOP == 0)
 MAX_WINDOWS_FOR_INFER = 20  # limit windows processed per-file to speed up
+STREAM_FILTERED = False  # causal notch+bandpass on /ws/stream chunks
+MAX_SECONDS_FOR_INFER = None  # if set, /predict reads only this many seconds (chunked, bounded memory)
+
+# --- Full-recording inference (instead of the first MAX_WINDOWS_FOR_INFER windows) ---
+# Streams the upload from disk (iter_eeg_chunks) with a causal filter, so memory is bounded by
+# INFER_CHUNK_SEC of samples plus one batch; risks differ slightly from the zero-phase default path.
+INFER_FULL_RECORDING = False
+INFER_CHUNK_SEC = 60.0        # seconds of samples read per block while walking the recording
+INFER_BATCH_WINDOWS = 32      # windows per forward pass while walking the recording
+EARLY_STOP_TOL = None         # e.g. 0.01: stop once the running risk moves less than this...
+EARLY_STOP_PATIENCE = 2       # ...for this many consecutive batches
+EARLY_STOP_MIN_WINDOWS = 64   # but never before this many windows
+
+# --- Decode cache (binary .npy copies of parsed recordings) ---
+USE_DECODE_CACHE = True
+DECODE_CACHE_DIR = os.path.join(CACHE_DIR, "decoded")
+DECODE_CACHE_MAX_BYTES = 2 * 1024 ** 3  # LRU-evicted above this size
+
+# --- Result cache (/predict responses keyed by upload hash + model hash + config) ---
+USE_RESULT_CACHE = True
+RESULT_CACHE_DIR = os.path.join(CACHE_DIR, "results")
+RESULT_CACHE_MAX_ENTRIES = 1024      # JSON files on disk, LRU-evicted
+RESULT_CACHE_MEMORY_ENTRIES = 128    # hot entries also kept in memory
+
+# --- Online inference (/ws/infer: client-pushed EEG, risk pushed back per window) ---
+ONLINE_STEP_SEC = 0.25       # a new window (and risk update) per this much pushed EEG, rounded to whole HOPs
+ONLINE_RISK_WINDOWS = 8      # rolling risk = mean over the last N windows
+ONLINE_FILTERED = True       # causal notch+bandpass on pushed chunks
+MAX_ONLINE_SESSIONS = 64     # beyond this new sessions are closed with 1013 (try again later)
+ONLINE_MAX_CHUNK_SEC = 5.0   # larger pushes are rejected
+ONLINE_FS_RANGE = (64.0, 2048.0)  # client-declared fs outside this is rejected (it sizes the ring buffers)
+ONLINE_MAX_CHANNELS = 256
+
+# --- Tabular batch scoring (/predict/batch) ---
+CSV_CHUNK_ROWS = 1000  # rows parsed per pd.read_csv chunk
+USE_FLAT_FOREST = True      # score with models/tabular_forest/ (exported by train_tabular.py) when present
+FLAT_FOREST_MAX_ROWS = 256  # larger batches go to sklearn's compiled predict_proba, faster there
+
+# --- Heatmaps ---
+HEATMAP_ANNOTATE = False  # True: matplotlib figure with axes/ticks/colorbar; False: fast bare LUT PNG
+
+# --- Output store (OUTPUT_STORE_DIR: content-addressed, swept in the background) ---
+OUTPUT_STORE_DIR = os.path.join(OUTPUT_DIR, "store")  # served as /outputs/store/; files elsewhere in OUTPUT_DIR are never swept
+OUTPUT_MAX_BYTES = 512 * 1024 ** 2  # least recently used files evicted above this
+OUTPUT_TTL_SEC = 24 * 3600          # files not written/served from cache for this long are removed
+OUTPUT_SWEEP_INTERVAL_SEC = 300
+
+# --- Deferred heatmaps (/predict answers first, Grad-CAM/PNG rendered in the background) ---
+DEFER_HEATMAPS = False      # default for /predict?defer_heatmap=...
+HEATMAP_WORKERS = 1
+MAX_PENDING_HEATMAPS = 32   # queued + running; beyond this the heatmap is rendered inline
+
+# --- Inference batching (/predict requests share forward passes) ---
+USE_MICRO_BATCHING = True
+BATCH_MAX_WINDOWS = 64   # flush once this many windows are queued
+BATCH_MAX_WAIT_MS = 5.0  # or this long after the first window arrived
+
+# --- Request execution (CPU-bound /predict work runs off the event loop) ---
+PREDICT_EXECUTOR = "thread"    # "thread" | "process"
+PREDICT_WORKERS = 2
+MAX_INFLIGHT_PREDICTIONS = 8   # queued + running; beyond this /predict answers 503
+RETRY_AFTER_SEC = 2
 
 # --- Model defaults (MUST match training) ---
 MODEL_CFG = {
@@ -25,6 +90,17 @@ MODEL_CFG = {
     "dropout": 0.2,
 }
 
+INFERENCE_BACKEND = "eager"  # "eager" | "torchscript" | "int8" | "compile" (see models.predictor.BACKENDS)
+OPTIMIZE_MODEL = True        # fuse Conv2d+BatchNorm2d at load time
+WARMUP_ON_STARTUP = True     # run dummy batches through the default model before serving
+WARMUP_TABULAR = True        # load the tabular artifacts and score a dummy row at startup
+PRELOAD_GRADCAM = True       # import pytorch_grad_cam (torchvision, matplotlib) during warm-up, not on the first heatmap
+WARMUP_IN_BACKGROUND = True  # accept connections at once; /healthz answers 503 until warm-up is done
+WARMUP_TIMEOUT_SEC = 600     # process pools: give up waiting for a worker's warm-up report after this
+TORCH_INTRA_OP_THREADS = None  # None = torch default
+TORCH_INTER_OP_THREADS = None
+MAX_RESIDENT_MODELS = 4  # warm models kept per (in_channels, MODEL_CFG), LRU beyond that
+
 # --- Ensure directories exist ---
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
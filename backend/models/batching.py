@@ -0,0 +1,132 @@
+# models/batching.py
+import time
+import queue
+import asyncio
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import torch
+
+from .predictor import predict_windows
+
+
+class _Job:
+    __slots__ = ("model", "device", "windows", "future", "enqueued")
+
+    def __init__(self, model, device, windows):
+        self.model = model
+        self.device = device
+        self.windows = windows
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    In-process dynamic batching for ``predict_windows``.
+
+    Window tensors submitted by concurrent requests are gathered until
+    ``max_batch`` windows are waiting or ``max_wait_ms`` has passed since the
+    first one arrived, then run as one forward pass per (model, input shape)
+    group. Each caller gets back exactly the per-window results of its own
+    windows.
+    """
+
+    def __init__(self, max_batch: int = 64, max_wait_ms: float = 5.0):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self._batch_sizes = Counter()   # windows per forward pass -> count
+        self._waits = deque(maxlen=1024)  # seconds from submit to result
+        self.n_batches = 0
+        self.n_requests = 0
+        self.n_windows = 0
+
+    # ---------- public API ----------
+    def submit(self, model, device, windows: torch.Tensor) -> Future:
+        """Queue ``windows`` (B, C, F, T); the future resolves to predict_windows' result."""
+        self._ensure_worker()
+        job = _Job(model, device, windows)
+        self._queue.put(job)
+        return job.future
+
+    async def predict(self, model, device, windows: torch.Tensor):
+        """Awaitable ``predict_windows`` that goes through the batcher."""
+        return await asyncio.wrap_future(self.submit(model, device, windows))
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        pct = lambda q: round(1000 * waits[min(len(waits) - 1, int(q * len(waits)))], 2) if waits else None
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batches": self.n_batches,
+            "requests": self.n_requests,
+            "windows": self.n_windows,
+            "avg_batch_windows": round(self.n_windows / self.n_batches, 2) if self.n_batches else 0.0,
+            "batch_size_hist": dict(sorted(self._batch_sizes.items())),
+            "latency_ms_p50": pct(0.50),
+            "latency_ms_p99": pct(0.99),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    # ---------- worker ----------
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """Block for the first job, then gather more until the size or deadline limit."""
+        jobs = [self._queue.get()]
+        n = len(jobs[0].windows)
+        deadline = time.perf_counter() + self.max_wait
+        while n < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            n += len(job.windows)
+        return jobs
+
+    def _run(self):
+        while True:
+            jobs = self._collect()
+            groups = {}
+            for job in jobs:
+                key = (id(job.model), tuple(job.windows.shape[1:]))
+                groups.setdefault(key, []).append(job)
+            for group in groups.values():
+                self._run_group(group)
+
+    def _run_group(self, jobs):
+        head = jobs[0]
+        try:
+            batch = torch.cat([j.windows for j in jobs], dim=0)
+            results = predict_windows(head.model, head.device, batch)
+        except Exception as e:
+            for j in jobs:
+                j.future.set_exception(e)
+            return
+
+        self.n_batches += 1
+        self.n_requests += len(jobs)
+        self.n_windows += len(batch)
+        self._batch_sizes[len(batch)] += 1
+
+        start = 0
+        now = time.perf_counter()
+        for j in jobs:
+            n = len(j.windows)
+            j.future.set_result(results[start:start + n])
+            self._waits.append(now - j.enqueued)
+            start += n
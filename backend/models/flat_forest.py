@@ -0,0 +1,127 @@
+# models/flat_forest.py
+"""
+RandomForestClassifier exported as flat node arrays and evaluated with numpy.
+
+All trees are concatenated into one node table (feature, threshold, children
+as (left, right) pairs, per-class leaf probabilities) stored as plain ``.npy``
+files in the dtypes traversal indexes with, so the server maps them with
+``np.load(mmap_mode="r")`` and uses them in place instead of unpickling 200
+sklearn estimators. Leaves point to themselves with a +inf threshold, which
+lets every tree of every row advance one level per vectorized step; paths
+that have reached a leaf are dropped from the following steps.
+
+Probabilities reproduce ``predict_proba`` bit for bit: inputs are compared in
+float32 like sklearn's trees, leaf values are normalized the same way and
+trees are summed in estimator order before dividing by their count.
+"""
+import os
+import json
+from typing import Optional
+
+import numpy as np
+
+FORMAT_VERSION = 2
+_ARRAYS = ("feature", "threshold", "children", "value", "roots")
+
+
+def export_forest(clf, out_dir: str, model_digest: Optional[str] = None) -> str:
+    """Write a fitted single-output RandomForestClassifier to ``out_dir``."""
+    if getattr(clf, "n_outputs_", 1) != 1:
+        raise ValueError("Only single-output forests can be exported.")
+
+    feature, threshold, children, value, roots = [], [], [], [], []
+    offset = 0
+    for est in clf.estimators_:
+        t = est.tree_
+        n = t.node_count
+        is_leaf = t.children_left == -1
+        nodes = np.arange(offset, offset + n)
+
+        feature.append(np.where(is_leaf, 0, t.feature).astype(np.intp))
+        threshold.append(np.where(is_leaf, np.inf, t.threshold).astype(np.float64))
+        left = np.where(is_leaf, nodes, t.children_left + offset)
+        right = np.where(is_leaf, nodes, t.children_right + offset)
+        children.append(np.stack([left, right], axis=1).ravel().astype(np.intp))
+
+        # DecisionTreeClassifier.predict_proba: value[:, :n_classes] / its row sum (0 -> 1)
+        v = t.value[:, 0, :clf.n_classes_].astype(np.float64)
+        normalizer = v.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.0] = 1.0
+        value.append(v / normalizer)
+
+        roots.append(offset)
+        offset += n
+
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = {
+        "feature": np.concatenate(feature), "threshold": np.concatenate(threshold),
+        "children": np.concatenate(children),
+        "value": np.concatenate(value), "roots": np.asarray(roots, dtype=np.intp),
+    }
+    for name, arr in arrays.items():
+        np.save(os.path.join(out_dir, name + ".npy"), np.ascontiguousarray(arr))
+
+    meta = {
+        "version": FORMAT_VERSION,
+        "n_trees": len(clf.estimators_),
+        "n_nodes": int(offset),
+        "n_features": int(clf.n_features_in_),
+        "n_classes": int(clf.n_classes_),
+        "classes": np.asarray(clf.classes_).tolist(),
+        "max_depth": int(max(est.tree_.max_depth for est in clf.estimators_)),
+        "model_digest": model_digest,
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return out_dir
+
+
+class FlatForest:
+    """Memory-mapped flat forest with a vectorized ``predict_proba``."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported flat forest version: {self.meta.get('version')}")
+        for name in _ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, name + ".npy"), mmap_mode="r"))
+        # exported as intp, so these stay memory-mapped (a copy only for another platform's intp)
+        self.feature = self.feature.astype(np.intp, copy=False)
+        self.children = self.children.astype(np.intp, copy=False)
+        self.roots = self.roots.astype(np.intp, copy=False)
+        self.n_trees = self.meta["n_trees"]
+        self.max_depth = self.meta["max_depth"]
+        self.n_features_in_ = self.meta["n_features"]
+        self.classes_ = np.asarray(self.meta["classes"])
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node (global index) reached by every row in every tree: (n_rows, n_trees)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)  # sklearn trees compare float32 inputs
+        n_rows, n_features = X.shape
+        flat_x = X.ravel()
+
+        leaves = np.repeat(self.roots[None, :], n_rows, axis=0).ravel()
+        node = leaves.copy()
+        pos = np.arange(node.size)                               # slot in ``leaves``
+        base = np.repeat(np.arange(n_rows) * n_features, self.n_trees)  # row offset in flat_x
+        for _ in range(self.max_depth):
+            go_right = ~(flat_x[base + self.feature[node]] <= self.threshold[node])  # NaN goes right
+            nxt = self.children[2 * node + go_right]
+            moving = nxt != node
+            if not moving.all():
+                # paths that reached a leaf drop out of the remaining steps
+                leaves[pos[~moving]] = node[~moving]
+                pos, base, nxt = pos[moving], base[moving], nxt[moving]
+            node = nxt
+            if not node.size:
+                break
+        leaves[pos] = node
+        return leaves.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        leaf_values = self.value[self.apply(X)]  # (n_rows, n_trees, n_classes)
+        # running sum in estimator order, as RandomForestClassifier accumulates
+        proba = np.cumsum(leaf_values, axis=1)[:, -1]
+        proba /= self.n_trees
+        return proba
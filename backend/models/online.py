@@ -0,0 +1,121 @@
+# models/online.py
+import time
+import asyncio
+import threading
+from collections import deque
+
+import numpy as np
+import torch
+
+from .predictor import predict_windows
+
+
+class OnlineMetrics:
+    """
+    Process-wide counters of /ws/infer sessions and the end-to-end latency of
+    their windows: from receiving the chunk that completed a window to having
+    its prediction ready to send.
+    """
+
+    def __init__(self, maxlen: int = 4096):
+        self._lock = threading.Lock()
+        self._latency = deque(maxlen=maxlen)  # seconds, one entry per window
+        self.active = 0
+        self.sessions = 0
+        self.windows = 0
+        self.chunks = 0
+
+    def open(self):
+        with self._lock:
+            self.active += 1
+            self.sessions += 1
+
+    def close(self):
+        with self._lock:
+            self.active -= 1
+
+    def record(self, latency_sec: float, n_windows: int):
+        with self._lock:
+            self.chunks += 1
+            self.windows += n_windows
+            self._latency.extend([latency_sec] * n_windows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lat = sorted(self._latency)
+            out = {"active_sessions": self.active, "sessions": self.sessions,
+                   "chunks": self.chunks, "windows": self.windows}
+        pct = lambda q: round(1000 * lat[min(len(lat) - 1, int(q * len(lat)))], 2) if lat else None
+        out.update(latency_ms_p50=pct(0.50), latency_ms_p90=pct(0.90), latency_ms_p99=pct(0.99),
+                   latency_ms_max=round(1000 * lat[-1], 2) if lat else None)
+        return out
+
+
+ONLINE_METRICS = OnlineMetrics()
+
+
+class OnlineSession:
+    """
+    One client's live inference: windows from an ``OnlineWindower`` go through
+    the model (via the shared micro-batcher when given, so concurrent sessions
+    share forward passes) and come back as per-window risk messages with a
+    rolling risk, the mean P(Risky) over the last ``risk_windows`` windows.
+    """
+
+    def __init__(self, windower, runner, device, batcher=None, risk_windows: int = 8,
+                 threshold: float = 0.40, metrics: OnlineMetrics = ONLINE_METRICS):
+        self.windower = windower
+        self.runner = runner
+        self.device = device
+        self.batcher = batcher
+        self.threshold = threshold
+        self.metrics = metrics
+        self._recent = deque(maxlen=risk_windows)
+
+    def describe(self) -> dict:
+        w = self.windower
+        return {"type": "ready", "fs": w.fs, "n_channels": w.n_channels,
+                "window_sec": w.window_size / w.fs, "step_sec": w.step_sec,
+                "risk_windows": self._recent.maxlen}
+
+    def _windows(self, chunk: np.ndarray):
+        inputs, ends = self.windower.push(chunk)
+        return (torch.as_tensor(inputs, dtype=torch.float32) if ends else None), ends
+
+    async def push(self, chunk: np.ndarray, received: float, seq=None) -> list:
+        """
+        Feed a (ch, n) chunk received at ``received`` (perf_counter); returns one
+        message per window it completed (usually 0 or 1). Filtering, STFT and the
+        forward pass run in worker threads, never on the event loop; a session
+        awaits each push before the next, so its windower is never shared.
+        """
+        batch, ends = await asyncio.to_thread(self._windows, chunk)
+        if not ends:
+            return []
+        if self.batcher is not None:
+            results = await self.batcher.predict(self.runner, self.device, batch)
+        else:
+            results = await asyncio.to_thread(predict_windows, self.runner, self.device, batch)
+        latency = time.perf_counter() - received
+        self.metrics.record(latency, len(ends))
+
+        fs, size = self.windower.fs, self.windower.window_size
+        now = time.time()
+        messages = []
+        for r, end in zip(results, ends):
+            self._recent.append(r["risk"])
+            risk = float(np.mean(self._recent))
+            messages.append({
+                "type": "risk",
+                "seq": seq,                      # client frame that completed the window
+                "t_start": (end - size) / fs,    # stream time, seconds
+                "t_end": end / fs,
+                "label": r["label"],
+                "confidence": round(r["confidence"], 4),
+                "window_risk": round(r["risk"], 4),  # P(Risky) of this window
+                "risk": round(risk, 4),
+                "risk_label": "At Risk" if risk >= self.threshold else "Healthy",
+                "latency_ms": round(1000 * latency, 2),
+                "server_time": now,
+            })
+        return messages
@@ -1,11 +1,22 @@
+import os
+import copy
+import warnings
 import torch
+import torch.nn as nn
 import torch.nn.functional as F
+from torch.nn.utils.fusion import fuse_conv_bn_eval
 from .cnn_bilstm import CNNBiLSTM
 
+# "eager": the nn.Module as loaded; "torchscript": traced + frozen graph with a
+# dynamic batch axis; "int8": dynamic int8 quantization of the LSTM and Linear layers (CPU);
+# "compile": torch.compile of the eager model
+BACKENDS = ("eager", "torchscript", "int8", "compile")
 
-def load_model(model_path: str, cfg: dict, device=None):
+
+def load_model(model_path: str, cfg: dict, device=None, optimize: bool = False):
     """
     Load a CNN-BiLSTM model from a checkpoint.
+    With ``optimize=True`` Conv2d+BatchNorm2d pairs are fused for inference.
     """
     if device is None:
         device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -14,28 +25,167 @@ def load_model(model_path: str, cfg: dict, device=None):
     model.load_state_dict(torch.load(model_path, map_location=device))
     model.to(device)
     model.eval()
+    if optimize:
+        fuse_conv_bn(model)
 
     return model, device
 
 
+def fuse_conv_bn(model: nn.Module) -> nn.Module:
+    """
+    Fold every BatchNorm2d that directly follows a Conv2d inside an nn.Sequential
+    into the conv weights (eval mode only); the BN slot becomes nn.Identity so
+    module indices stay stable.
+    """
+    for seq in [m for m in model.modules() if isinstance(m, nn.Sequential)]:
+        for i in range(len(seq) - 1):
+            conv, bn = seq[i], seq[i + 1]
+            if isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d):
+                seq[i] = fuse_conv_bn_eval(conv, bn)
+                seq[i + 1] = nn.Identity()
+    return model
+
+
+def configure_threads(intra_op: int = None, inter_op: int = None):
+    """Pin torch's intra-/inter-op thread pools (None keeps torch's default)."""
+    if intra_op:
+        torch.set_num_threads(intra_op)
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError as e:  # only allowed before the first parallel op
+            print("⚠️ Could not set inter-op threads:", e)
+
+
+def warmup(runner, device, window_shape, batch_sizes=(1,)):
+    """Run dummy batches so lazy init / tracing / compilation happens before real traffic."""
+    with torch.inference_mode():
+        for b in batch_sizes:
+            runner(torch.zeros((b, *window_shape), device=device))
+
+
 def predict_windows(model, device, windows: torch.Tensor, class_names=["Healthy", "Risky"]):
     """
-    Run inference on EEG windows and return predictions with confidence.
+    Run inference on EEG windows and return predictions with confidence
+    (top-class probability) and risk (probability of the last class, "Risky").
     """
     model.eval()
-    with torch.no_grad():
+    with torch.inference_mode():
         windows = windows.to(device)
         logits = model(windows)
         probs = F.softmax(logits, dim=1)
 
         pred_class = probs.argmax(dim=1).cpu().numpy()       # predicted class index
         pred_conf = probs.max(dim=1).values.cpu().numpy()    # confidence score
+        pred_risk = probs[:, -1].cpu().numpy()               # P(Risky)
 
         results = []
-        for cls, conf in zip(pred_class, pred_conf):
+        for cls, conf, risk in zip(pred_class, pred_conf, pred_risk):
             results.append({
                 "label": class_names[cls],
-                "confidence": float(conf)  
+                "confidence": float(conf),
+                "risk": float(risk),
             })
 
         return results
+
+
+class RunningRisk:
+    """
+    Running mean of per-window confidences over a recording walked in batches,
+    with optional early stopping once the mean has settled: after at least
+    ``min_windows`` windows, ``patience`` consecutive batches that move the mean
+    by less than ``tol`` end the walk.
+    """
+
+    def __init__(self, tol: float = None, min_windows: int = 0, patience: int = 2):
+        self.tol = tol
+        self.min_windows = min_windows
+        self.patience = patience
+        self.total = 0.0
+        self.n = 0
+        self._calm = 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.n if self.n else 0.0
+
+    def update(self, results) -> bool:
+        """Add one batch of ``predict_windows`` results; True when the walk can stop."""
+        before = self.mean
+        self.total += sum(r["confidence"] for r in results)
+        self.n += len(results)
+        if self.tol is None or self.n - len(results) == 0:
+            return False
+        self._calm = self._calm + 1 if abs(self.mean - before) < self.tol else 0
+        return self.n >= self.min_windows and self._calm >= self.patience
+
+
+def export_torchscript(model, example: torch.Tensor, out_path: str = None):
+    """
+    Trace ``model`` on ``example`` (B, C, F, T) and freeze it.
+    Only the batch axis may vary afterwards. Saved to ``out_path`` if given.
+    """
+    model.eval()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # torch.jit deprecation notices
+        with torch.no_grad():
+            traced = torch.jit.trace(model, example, check_trace=False)
+        scripted = torch.jit.freeze(traced)
+    if out_path:
+        torch.jit.save(scripted, out_path)
+    return scripted
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of the LSTM and Linear layers (runs on CPU)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return torch.ao.quantization.quantize_dynamic(
+            copy.deepcopy(model).cpu().eval(), {nn.LSTM, nn.Linear}, dtype=torch.qint8
+        )
+
+
+def exported_path(model_path: str, backend: str, window_shape) -> str:
+    """Where scripts/export_model.py saves (and ``build_backend`` looks for) a TorchScript export."""
+    suffix = "_int8" if backend == "int8" else ""
+    shape = "x".join(str(int(d)) for d in window_shape)
+    return f"{os.path.splitext(model_path)[0]}{suffix}.{shape}.ts.pt"
+
+
+def load_exported(model_path: str, backend: str, window_shape, device):
+    """The exported graph for this backend and window shape, or None if absent or older than the checkpoint."""
+    path = exported_path(model_path, backend, window_shape)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(model_path):
+            print("⚠️ Ignoring stale export (older than the checkpoint):", path)
+            return None
+    except OSError:
+        return None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # torch.jit deprecation notices
+        return torch.jit.load(path, map_location=device)
+
+
+def build_backend(model, device, backend: str, example_shape, model_path: str = None):
+    """
+    Return ``(runner, device)`` where ``runner(windows)`` gives logits like ``model``.
+    ``example_shape`` is one window's (C, F, T), used for tracing. With
+    ``model_path``, a matching export of that checkpoint is loaded instead of
+    quantizing / tracing at startup.
+    """
+    if backend == "eager":
+        return model, device
+    if backend in ("int8", "torchscript") and model_path:
+        run_device = torch.device("cpu") if backend == "int8" else device
+        runner = load_exported(model_path, backend, example_shape, run_device)
+        if runner is not None:
+            return runner, run_device
+    if backend == "int8":
+        return quantize_int8(model), torch.device("cpu")
+    if backend == "torchscript":
+        example = torch.zeros((2, *example_shape), device=device)
+        return export_torchscript(model, example), device
+    if backend == "compile":
+        return torch.compile(model, dynamic=True), device
+    raise ValueError(f"Unknown inference backend: {backend} (choose from {BACKENDS})")
@@ -0,0 +1,160 @@
+# models/registry.py
+import threading
+from collections import OrderedDict
+
+from .predictor import load_model, build_backend
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class ModelRegistry:
+    """
+    Thread-safe cache of warm CNN-BiLSTM instances keyed by (in_channels, model cfg).
+
+    Each entry is loaded from the checkpoint exactly once, even when several
+    requests ask for it at the same time; the least recently used entry is
+    dropped once ``max_models`` are resident.
+    """
+
+    def __init__(self, model_path: str, base_cfg: dict, max_models: int = 4, device=None,
+                 optimize: bool = False):
+        self.model_path = model_path
+        self.optimize = optimize
+        self.base_cfg = dict(base_cfg)
+        self.max_models = max_models
+        self.device = device
+        self._models = OrderedDict()  # key -> (model, device)
+        self._runners = {}            # (key, backend, window shape) -> (runner, device)
+        self._explainers = {}         # key -> (private model copy, device) for Grad-CAM
+        self._loading = {}            # model or runner key -> Lock held while it loads
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def _key(self, in_channels: int, cfg: dict):
+        return int(in_channels), _freeze(cfg)
+
+    def get(self, in_channels: int, cfg: dict = None):
+        """Return ``(model, device)`` for inputs with ``in_channels`` channels."""
+        cfg = dict(self.base_cfg if cfg is None else cfg)
+        cfg["in_channels"] = int(in_channels)
+        key = self._key(in_channels, cfg)
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return entry
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            try:
+                with self._lock:
+                    entry = self._models.get(key)
+                    if entry is not None:  # loaded by another thread while we waited
+                        self._models.move_to_end(key)
+                        self.hits += 1
+                        return entry
+
+                entry = load_model(self.model_path, cfg, device=self.device, optimize=self.optimize)
+
+                with self._lock:
+                    self._models[key] = entry
+                    self.loads += 1
+                    while len(self._models) > self.max_models:
+                        old_key, _ = self._models.popitem(last=False)
+                        self._runners = {k: v for k, v in self._runners.items() if k[0] != old_key}
+                        self._explainers.pop(old_key, None)
+                        self.evictions += 1
+                return entry
+            finally:
+                # also after a failed load (e.g. a channel count the checkpoint does not fit)
+                with self._lock:
+                    self._loading.pop(key, None)
+
+    def get_runner(self, window_shape, backend: str = "eager", cfg: dict = None):
+        """
+        ``(runner, device)`` for the given inference backend, built once per
+        (model, backend, window shape). Grad-CAM uses ``get_explainer()`` instead.
+        """
+        window_shape = tuple(int(d) for d in window_shape)
+        model, device = self.get(window_shape[0], cfg)
+        if backend == "eager":
+            return model, device
+        # exports are made from the checkpoint with the base config only
+        model_path = self.model_path if cfg is None else None
+        cfg = dict(self.base_cfg if cfg is None else cfg, in_channels=window_shape[0])
+        rkey = (self._key(window_shape[0], cfg), backend, window_shape)
+        with self._lock:
+            runner = self._runners.get(rkey)
+            if runner is not None:
+                return runner
+            key_lock = self._loading.setdefault(rkey, threading.Lock())
+
+        with key_lock:  # one build per runner key, like get()
+            try:
+                with self._lock:
+                    runner = self._runners.get(rkey)
+                if runner is None:
+                    runner = build_backend(model, device, backend, window_shape, model_path=model_path)
+                    with self._lock:
+                        self._runners[rkey] = runner
+                return runner
+            finally:
+                with self._lock:
+                    self._loading.pop(rkey, None)
+
+    def get_explainer(self, in_channels: int, cfg: dict = None):
+        """
+        ``(model, device)`` for Grad-CAM: a private, unfused copy of the checkpoint.
+        GradCAM hooks its target layer and runs backward passes, which must not
+        touch the instance that inference threads and the micro-batcher share,
+        and it must see the trained Conv+BN activations, not the fused ones
+        ``optimize`` produces.
+        """
+        _, device = self.get(in_channels, cfg)  # resident model: same eviction, same channel check
+        cfg = dict(self.base_cfg if cfg is None else cfg, in_channels=int(in_channels))
+        key = self._key(in_channels, cfg)
+        with self._lock:
+            entry = self._explainers.get(key)
+            if entry is not None:
+                return entry
+            key_lock = self._loading.setdefault(("explainer", key), threading.Lock())
+
+        with key_lock:
+            try:
+                with self._lock:
+                    entry = self._explainers.get(key)
+                if entry is None:
+                    entry = load_model(self.model_path, cfg, device=device, optimize=False)
+                    with self._lock:
+                        self._explainers[key] = entry
+                return entry
+            finally:
+                with self._lock:
+                    self._loading.pop(("explainer", key), None)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._runners.clear()
+            self._explainers.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "resident": [k[0] for k in self._models],
+                "runners": sorted({f"{k[1]}:{k[2]}" for k in self._runners}),
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "max_models": self.max_models,
+            }
@@ -3,12 +3,16 @@ import joblib
 import pickle
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import random
-from uuid import uuid4
+import time
 
-from config import OUTPUT_DIR
+from config import CSV_CHUNK_ROWS, USE_FLAT_FOREST, FLAT_FOREST_MAX_ROWS
 from utils.ai_utils import generate_ai_report
+from utils.output_store import get_output_store
+from xai.heatmap_render import render_heatmap_png
+from preprocessing.band_power import BAND_NAMES, band_percentages
+from preprocessing.decode_cache import file_digest
+from models.flat_forest import FlatForest
 
 # ==== Paths ====
 MODELS_DIR = os.path.dirname(__file__)
@@ -16,17 +20,34 @@ MODEL_PATH = os.path.join(MODELS_DIR, "tabular_model.pkl")
 SCALER_PATH = os.path.join(MODELS_DIR, "tabular_scaler.pkl")
 ENCODER_PATH = os.path.join(MODELS_DIR, "tabular_label_encoder.pkl")
 FEATURES_PATH = os.path.join(MODELS_DIR, "tabular_feature_names.pkl")
+FOREST_PATH = os.path.join(MODELS_DIR, "tabular_forest")  # flat export of MODEL_PATH
 
 # ==== Globals ====
 TABULAR_MODEL = None
+FLAT_FOREST = None
 SCALER = None
 ENCODER = None
 FEATURE_NAMES = None
+BAND_COLUMNS = {}          # band name -> feature column read for its power
+BAND_FEATURE_INDEX = None  # positions of BAND_COLUMNS in FEATURE_NAMES
+
+
+def match_band_columns(columns) -> dict:
+    """First column per band whose name contains the band's short name (e.g. "delta")."""
+    lowered = [c.lower() for c in columns]
+    band_columns = {}
+    for band in BAND_NAMES:
+        key = band.split()[0].lower()
+        for col, low in zip(columns, lowered):
+            if key in low:  # loose matching
+                band_columns[band] = col
+                break
+    return band_columns
 
 
 def load_artifacts():
-    """Load model, scaler, encoder and features once."""
-    global TABULAR_MODEL, SCALER, ENCODER, FEATURE_NAMES
+    """Load model, scaler, encoder and features once (and map band columns)."""
+    global TABULAR_MODEL, FLAT_FOREST, SCALER, ENCODER, FEATURE_NAMES, BAND_COLUMNS, BAND_FEATURE_INDEX
     if TABULAR_MODEL is not None:
         return
     if not os.path.exists(MODEL_PATH):
@@ -35,14 +56,93 @@ def load_artifacts():
     TABULAR_MODEL = joblib.load(MODEL_PATH)
     SCALER = joblib.load(SCALER_PATH)
     ENCODER = joblib.load(ENCODER_PATH)
+    FLAT_FOREST = load_flat_forest() if USE_FLAT_FOREST else None
 
     if os.path.exists(FEATURES_PATH):
         with open(FEATURES_PATH, "rb") as f:
             FEATURE_NAMES = pickle.load(f)
+        BAND_COLUMNS = match_band_columns(FEATURE_NAMES)
+        BAND_FEATURE_INDEX = np.array([FEATURE_NAMES.index(c) for c in BAND_COLUMNS.values()], dtype=np.intp)
+
+
+def load_flat_forest():
+    """The flat export of MODEL_PATH, or None when missing, outdated or exported from another model."""
+    if not os.path.exists(os.path.join(FOREST_PATH, "meta.json")):
+        return None
+    try:
+        forest = FlatForest(FOREST_PATH)
+    except ValueError as e:  # e.g. an export in an older format
+        print("⚠️ Ignoring flat forest (re-run scripts/export_forest.py):", e)
+        return None
+    if forest.meta.get("model_digest") != file_digest(MODEL_PATH):
+        print("⚠️ Ignoring stale flat forest (re-run scripts/export_forest.py):", FOREST_PATH)
+        return None
+    return forest
+
+
+def row_risks(Xs: np.ndarray) -> np.ndarray:
+    """Per-row risk: P(class 1) for binary models, else the top class probability."""
+    try:
+        # flat forest: same probabilities, without joblib/per-tree overhead on small batches
+        use_flat = FLAT_FOREST is not None and len(Xs) <= FLAT_FOREST_MAX_ROWS
+        probs = (FLAT_FOREST if use_flat else TABULAR_MODEL).predict_proba(Xs)
+        return probs[:, 1] if probs.shape[1] == 2 else probs.max(axis=1)
+    except Exception:
+        return (TABULAR_MODEL.predict(Xs) == 1).astype(np.float64)
+
+
+def risk_label(risk: float) -> str:
+    return "Healthy" if risk <= 0.4 else "At Risk"
+
+
+def plot_csv_figure(reshaped: np.ndarray, out_path: str):
+    """Annotated matplotlib version of the CSV heatmap (band ticks, colorbar, title)."""
+    from matplotlib.figure import Figure  # only needed for annotated heatmaps
+
+    n_bands = reshaped.shape[0]
+    fig = Figure(figsize=(10, 4))  # not pyplot: safe from the /predict worker threads
+    ax = fig.subplots()
+    im = ax.imshow(reshaped, aspect="auto", cmap="turbo", origin="lower")
+    fig.colorbar(im, ax=ax, label="Activation Intensity")
+
+    ax.set_yticks(range(n_bands), BAND_NAMES)
+    ax.set_ylabel("Frequency Bands")
+    ax.set_xlabel("Time (s)")
+    ax.set_title("CSV Data Grad-CAM Style Heatmap")
+
+    fig.tight_layout()
+    fig.savefig(out_path, dpi=150, bbox_inches="tight")
+
+
+def render_csv_heatmap(values: np.ndarray, annotate: bool = False) -> str:
+    """
+    Render one scaled feature row as the EEG-style band x time heatmap; returns its URL.
+    ``annotate=True`` uses the matplotlib figure, otherwise the fast LUT renderer.
+    """
+    n_features = values.shape[0]
+    n_bands = 5  # Delta, Theta, Alpha, Beta, Gamma
+    n_time = n_features // n_bands if n_features >= n_bands else n_features
+
+    reshaped = values[:n_bands * n_time].reshape(n_bands, n_time)
+
+    # Normalize 0–1
+    reshaped = (reshaped - reshaped.min()) / (reshaped.max() - reshaped.min() + 1e-6)
+
+    store = get_output_store()
+    out_path = store.temp_path(".png")
+    if annotate:
+        plot_csv_figure(reshaped, out_path)
+    else:
+        render_heatmap_png(reshaped, out_path, origin="lower")
+    return store.adopt(out_path, "csv_heatmap")
 
 
-def predict_csv_file(csv_path: str) -> dict:
-    """Predict using CSV/tabular model and generate EEG-style heatmap."""
+def predict_csv_file(csv_path: str, render_heatmap: bool = True, annotate: bool = False) -> dict:
+    """
+    Predict using CSV/tabular model and generate EEG-style heatmap.
+    With ``render_heatmap=False`` the heatmap is left to the caller: the result
+    carries the scaled row as ``heatmap_input`` for ``render_csv_heatmap``.
+    """
     load_artifacts()
     df = pd.read_csv(csv_path)
 
@@ -65,38 +165,21 @@ def predict_csv_file(csv_path: str) -> dict:
     Xs = SCALER.transform(X)
 
     # ==== Prediction ====
-    try:
-        probs = TABULAR_MODEL.predict_proba(Xs)
-        avg_prob = float(probs[:, 1].mean()) if probs.shape[1] == 2 else float(probs.max(axis=1).mean())
-    except Exception:
-        preds = TABULAR_MODEL.predict(Xs)
-        avg_prob = float((preds == 1).mean())
+    avg_prob = float(row_risks(Xs).mean())
     risk_confidence = avg_prob
-    if risk_confidence <= 0.4:
-        label = "Healthy"
-    else:
-        label = "At Risk"
+    label = risk_label(risk_confidence)
     confidence = round(random.uniform(93.0, 98.0), 2)
 
     # ==== Explanation with Band Power Percentages ====
     try:
-        band_scores = {}
-
         # If CSV already contains these band columns, grab them directly
-        for band in ["Delta (0.5–4 Hz)", "Theta (4–8 Hz)", "Alpha (8–13 Hz)", "Beta (13–30 Hz)", "Gamma (30–45 Hz)"]:
-            for col in df.columns:
-                if band.split()[0].lower() in col.lower():  # loose matching
-                    band_scores[band] = float(df[col].iloc[0])
-                    break
+        band_columns = BAND_COLUMNS if FEATURE_NAMES is not None else match_band_columns(list(df.columns))
+        band_scores = {band: float(df[col].iloc[0]) for band, col in band_columns.items()}
 
         if not band_scores:  # fallback if no direct columns found
             raise ValueError("No band features found in CSV")
         # Normalize to percentages
-        total_power = sum(band_scores.values())
-        band_percents = {
-            b: (v / total_power) * 100 if total_power > 0 else 0
-            for b, v in band_scores.items()
-        }
+        band_percents = band_percentages(band_scores)
 
         if label == "At Risk":
             explanation = (
@@ -121,32 +204,11 @@ def predict_csv_file(csv_path: str) -> dict:
         explanation = "EEG explanation could not be generated."
 
     # ==== EEG-style Heatmap (continuous freq × time) ====
-    n_features = Xs.shape[1]
-    n_bands = 5  # Delta, Theta, Alpha, Beta, Gamma
-    n_time = n_features // n_bands if n_features >= n_bands else n_features
-
-    reshaped = Xs[0, :n_bands * n_time].reshape(n_bands, n_time)
-
-    # Normalize 0–1
-    reshaped = (reshaped - reshaped.min()) / (reshaped.max() - reshaped.min() + 1e-6)
-
-    out_fname = f"csv_heatmap_{uuid4().hex}.png"
-    out_path = os.path.join(OUTPUT_DIR, out_fname)
-
-    plt.figure(figsize=(10, 4))
-    im = plt.imshow(reshaped, aspect="auto", cmap="turbo", origin="lower")
-    plt.colorbar(im, label="Activation Intensity")
-
-    plt.yticks(range(n_bands), ["Delta (0.5–4 Hz)", "Theta (4–8 Hz)",
-                                "Alpha (8–13 Hz)", "Beta (13–30 Hz)", "Gamma (30–45 Hz)"])
-    plt.ylabel("Frequency Bands")
-    plt.xlabel("Time (s)")
-    plt.title("CSV Data Grad-CAM Style Heatmap")
-
-    plt.tight_layout()
-    plt.savefig(out_path, dpi=150, bbox_inches="tight")
-    plt.close()
-    heatmap_url = f"/outputs/{out_fname}"
+    heatmap_input = None
+    if render_heatmap:
+        heatmap_url = render_csv_heatmap(Xs[0], annotate=annotate)
+    else:
+        heatmap_url, heatmap_input = None, np.array(Xs[0])
 
     # ==== AI Report ====
     ai_report = generate_ai_report(label, confidence, [], [])
@@ -157,5 +219,50 @@ def predict_csv_file(csv_path: str) -> dict:
         "risk_confidence": risk_confidence,
         "heatmap": heatmap_url,
         "explanation": explanation,
-        "ai_report": ai_report
+        "ai_report": ai_report,
+        "heatmap_input": heatmap_input
+    }
+
+
+def score_csv_batch(csv_path: str, chunk_rows: int = CSV_CHUNK_ROWS) -> dict:
+    """
+    Score every row of a multi-patient CSV independently.
+
+    Only the model's feature columns are parsed, as float32, ``chunk_rows`` rows
+    at a time, so memory stays bounded for large files. Each row gets its own
+    label, risk and band percentages (from the band columns mapped at load time).
+    """
+    load_artifacts()
+    if FEATURE_NAMES is None:
+        raise ValueError(f"Batch scoring needs the feature list at: {FEATURES_PATH}")
+
+    t0 = time.perf_counter()
+    rows = []
+    reader = pd.read_csv(csv_path, usecols=FEATURE_NAMES, dtype=np.float32, chunksize=chunk_rows)
+    for chunk in reader:
+        X = np.nan_to_num(chunk[FEATURE_NAMES].to_numpy(), nan=0.0)  # training column order
+        risks = row_risks(SCALER.transform(X))
+
+        bands = X[:, BAND_FEATURE_INDEX].astype(np.float64)
+        totals = bands.sum(axis=1, keepdims=True)
+        percents = np.divide(bands * 100, totals, out=np.zeros_like(bands), where=totals > 0)
+
+        for risk, pct in zip(risks.tolist(), percents.tolist()):
+            rows.append({
+                "row": len(rows),
+                "prediction": risk_label(risk),
+                "risk_confidence": risk,
+                "band_percents": dict(zip(BAND_COLUMNS, pct)),
+            })
+    elapsed = time.perf_counter() - t0
+
+    if not rows:
+        raise ValueError("CSV has no rows.")
+    return {
+        "rows": rows,
+        "n_rows": len(rows),
+        "n_at_risk": sum(r["prediction"] == "At Risk" for r in rows),
+        "mean_risk": float(np.mean([r["risk_confidence"] for r in rows])),
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(len(rows) / elapsed, 1) if elapsed > 0 else None,
     }
@@ -0,0 +1,85 @@
+# preprocessing/band_power.py
+"""
+Band powers from a PSD: Welch over the raw signal, or frames of an STFT that
+was already computed for the model. Each frequency grid gets one cached
+(n_bins, n_bands) averaging matrix, so every band of every channel comes out
+of a single matmul instead of one boolean mask + mean per band.
+"""
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import numpy as np
+from scipy.signal import spectrogram
+
+# label -> (low Hz, high Hz), both edges inclusive; order is the reporting order
+BANDS = {
+    "Delta (0.5–4 Hz)": (0.5, 4),
+    "Theta (4–8 Hz)": (4, 8),
+    "Alpha (8–13 Hz)": (8, 13),
+    "Beta (13–30 Hz)": (13, 30),
+    "Gamma (30–45 Hz)": (30, 45),
+}
+BAND_NAMES = list(BANDS)
+
+
+@lru_cache(maxsize=32)
+def band_matrix(fs: float, n_fft: int, bands: Tuple[Tuple[float, float], ...]) -> np.ndarray:
+    """
+    (n_fft // 2 + 1, n_bands) matrix whose column b averages the rfft bins
+    inside band b. A band without bins gets an all-zero column (power 0).
+    """
+    freqs = np.fft.rfftfreq(n_fft, d=1.0 / fs)
+    W = np.zeros((len(freqs), len(bands)))
+    for b, (lo, hi) in enumerate(bands):
+        idx = np.flatnonzero((freqs >= lo) & (freqs <= hi))
+        if len(idx):
+            W[idx, b] = 1.0 / len(idx)
+    W.setflags(write=False)
+    return W
+
+
+def _bands_key(bands: Dict[str, Tuple[float, float]]):
+    return tuple((float(lo), float(hi)) for lo, hi in bands.values())
+
+
+def psd_band_power(psd: np.ndarray, fs: float, n_fft: int,
+                   bands: Dict[str, Tuple[float, float]] = BANDS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    ``psd``: (..., ch, n_fft // 2 + 1) -> (per-channel (..., ch, n_bands),
+    global (..., n_bands) averaged over channels).
+    """
+    per_channel = psd @ band_matrix(float(fs), int(n_fft), _bands_key(bands))
+    return per_channel, per_channel.mean(axis=-2)
+
+
+def welch_psd(x: np.ndarray, fs: float, nperseg: int = 256) -> np.ndarray:
+    """
+    ``scipy.signal.welch`` defaults (Hann, 50% overlap, constant detrend, density),
+    computed as the frame mean of ``spectrogram``, which is several times faster
+    than ``welch`` itself here.
+    """
+    _, _, Sxx = spectrogram(x, fs, window="hann", nperseg=nperseg, noverlap=nperseg // 2, axis=-1)
+    return Sxx.mean(axis=-1)
+
+
+def welch_band_power(x: np.ndarray, fs: float, nperseg: int = 256,
+                     bands: Dict[str, Tuple[float, float]] = BANDS) -> Tuple[np.ndarray, np.ndarray]:
+    """Band powers of ``x`` (ch, samples) from a Welch PSD with ``nperseg``-sample segments."""
+    nperseg = min(nperseg, x.shape[-1])
+    return psd_band_power(welch_psd(x, fs, nperseg), fs, nperseg, bands)
+
+
+def stft_band_power(Sxx: np.ndarray, fs: float, n_fft: int,
+                    bands: Dict[str, Tuple[float, float]] = BANDS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Band powers from an already computed power spectrogram ``Sxx``
+    (..., ch, F, frames), e.g. scipy.signal.spectrogram output, averaged over frames.
+    """
+    return psd_band_power(Sxx.mean(axis=-1), fs, n_fft, bands)
+
+
+def band_percentages(powers) -> Dict[str, float]:
+    """Share of each band in the total, in %, keyed by band name (0 when the total is 0)."""
+    powers = dict(zip(BAND_NAMES, powers)) if not isinstance(powers, dict) else powers
+    total = float(sum(powers.values()))
+    return {b: (float(v) / total) * 100 if total > 0 else 0 for b, v in powers.items()}
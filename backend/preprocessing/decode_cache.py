@@ -0,0 +1,142 @@
+# preprocessing/decode_cache.py
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+CACHE_VERSION = 2
+_HASH_CHUNK = 1 << 20
+
+
+def file_digest(filepath: str) -> str:
+    """SHA-256 of the file contents (streamed, constant memory)."""
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class DecodeCache:
+    """
+    Content-addressed cache of decoded recordings.
+
+    Each entry is a float32 ``<key>.npy`` plus a ``<key>.json`` sidecar holding
+    fs and channel names. Hits are served through ``np.load(mmap_mode="r")``.
+    The total size of the ``.npy`` files is capped; the least recently used
+    entries (by mtime, refreshed on every hit) are evicted first.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2 << 30, max_digests: int = 4096):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        self.max_digests = max_digests
+        self._lock = threading.Lock()
+        # (path, size, mtime_ns) -> content digest, avoids re-hashing unchanged files; LRU, under _lock
+        self._digests = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # ---------- keys ----------
+    def _digest(self, filepath: str) -> str:
+        st = os.stat(filepath)
+        stat_key = (os.path.abspath(filepath), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(stat_key)
+            if digest is not None:
+                self._digests.move_to_end(stat_key)
+                return digest
+        digest = file_digest(filepath)  # outside the lock: hashing is slow and safe to repeat
+        with self._lock:
+            self._digests[stat_key] = digest
+            while len(self._digests) > self.max_digests:
+                self._digests.popitem(last=False)
+        return digest
+
+    def key_for(self, filepath: str, *params) -> str:
+        """Cache key: file content hash + decode parameters."""
+        h = hashlib.sha256(self._digest(filepath).encode())
+        h.update(repr((CACHE_VERSION,) + params).encode())
+        return h.hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key)
+        return base + ".npy", base + ".json"
+
+    # ---------- get / put ----------
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, Optional[float], List[str]]]:
+        npy_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            x = np.load(npy_path, mmap_mode="r")
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            os.utime(npy_path)  # LRU touch
+        except OSError:
+            pass
+        self.hits += 1
+        return x, meta["fs"], meta["ch_names"]
+
+    def put(self, key: str, x: np.ndarray, fs: Optional[float], ch_names: List[str]):
+        npy_path, meta_path = self._paths(key)
+        tmp_suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+
+        # write data first, sidecar last: an entry is valid only once both exist
+        with open(npy_path + tmp_suffix, "wb") as f:
+            np.save(f, np.ascontiguousarray(x, dtype=np.float32))
+        os.replace(npy_path + tmp_suffix, npy_path)
+        with open(meta_path + tmp_suffix, "w") as f:
+            json.dump({"fs": fs, "ch_names": list(ch_names)}, f)
+        os.replace(meta_path + tmp_suffix, meta_path)
+
+        self.evict()
+
+    # ---------- eviction ----------
+    def evict(self):
+        """Drop least recently used entries until the size cap is respected."""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".npy"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, name[:-4]))
+                total += st.st_size
+
+            entries.sort()
+            for _, size, key in entries:
+                if total <= self.max_bytes:
+                    break
+                for path in self._paths(key):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+
+    def stats(self) -> dict:
+        n_entries, n_bytes = 0, 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npy"):
+                n_entries += 1
+                n_bytes += os.path.getsize(os.path.join(self.cache_dir, name))
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": n_entries,
+            "bytes": n_bytes,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,135 @@
+# preprocessing/feature_store.py
+import os
+import json
+import shutil
+import hashlib
+from typing import Callable, List
+
+import numpy as np
+from tqdm import tqdm
+
+STORE_VERSION = 2  # bump when preprocessing code changes what gets stored
+SHARD_WINDOWS = 4096  # max windows per shard file
+
+
+def config_fingerprint(cfg: dict) -> str:
+    """Short stable hash of the preprocessing config."""
+    blob = json.dumps({"version": STORE_VERSION, **cfg}, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()[:16]
+
+
+def _scan_split(root_dir: str):
+    """(classes, [(relpath, label)]) with the same class/label order as EEGDataset."""
+    classes = sorted(os.listdir(root_dir))
+    items = []
+    for label, cls in enumerate(classes):
+        for fname in os.listdir(os.path.join(root_dir, cls)):
+            items.append((os.path.join(cls, fname), label))
+    return classes, items
+
+
+def _manifest(root_dir: str, items) -> List[list]:
+    out = []
+    for rel, _ in items:
+        st = os.stat(os.path.join(root_dir, rel))
+        out.append([rel, st.st_size, st.st_mtime_ns])
+    return out
+
+
+def store_path(store_dir: str, split: str, cfg: dict) -> str:
+    return os.path.join(store_dir, config_fingerprint(cfg), split)
+
+
+def is_fresh(path: str, root_dir: str) -> bool:
+    """True when the store at ``path`` was built from the current files of ``root_dir``."""
+    index_path = os.path.join(path, "index.json")
+    if not os.path.exists(index_path):
+        return False
+    with open(index_path) as f:
+        index = json.load(f)
+    _, items = _scan_split(root_dir)
+    return index.get("manifest") == _manifest(root_dir, items)
+
+
+def build_feature_store(root_dir: str, store_dir: str, split: str, cfg: dict,
+                        preprocess_fn: Callable[[str], np.ndarray],
+                        force: bool = False) -> str:
+    """
+    Preprocess every recording under ``root_dir/<class>/`` once.
+
+    ``preprocess_fn(path)`` returns the normalized windows of one recording,
+    shape ``(n_windows, ch, F, T)``. Windows are written as float32 shards under
+    ``store_dir/<config fingerprint>/<split>/`` together with an ``index.json``
+    holding labels, per-file shard offsets and a manifest of the source files.
+    A changed config lands in a new fingerprint directory; changed source
+    files trigger a rebuild.
+    """
+    out_dir = store_path(store_dir, split, cfg)
+    if not force and is_fresh(out_dir, root_dir):
+        return out_dir
+
+    classes, items = _scan_split(root_dir)
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    shards, files = [], []
+    buf, buf_n = [], 0
+
+    def flush():
+        nonlocal buf, buf_n
+        if not buf:
+            return
+        name = f"shard_{len(shards):03d}.npy"
+        arr = np.concatenate(buf, axis=0).astype(np.float32, copy=False)
+        np.save(os.path.join(tmp_dir, name), arr)
+        shards.append({"file": name, "shape": list(arr.shape)})
+        buf, buf_n = [], 0
+
+    for rel, label in tqdm(items, desc=f"Build {split}"):
+        wins = np.asarray(preprocess_fn(os.path.join(root_dir, rel)), dtype=np.float32)
+        shape_changed = buf and buf[-1].shape[1:] != wins.shape[1:]
+        if buf_n + len(wins) > SHARD_WINDOWS or shape_changed:
+            flush()
+        files.append({
+            "path": rel, "label": label,
+            "shard": len(shards), "start": buf_n, "n_windows": int(len(wins)),
+        })
+        buf.append(wins)
+        buf_n += len(wins)
+    flush()
+
+    with open(os.path.join(tmp_dir, "index.json"), "w") as f:
+        json.dump({
+            "version": STORE_VERSION,
+            "config": cfg,
+            "classes": classes,
+            "shards": shards,
+            "files": files,
+            "manifest": _manifest(root_dir, items),
+        }, f, default=str)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+
+class FeatureStore:
+    """Read side of a built store; shards are opened as copy-on-write memory maps."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "index.json")) as f:
+            self.index = json.load(f)
+        self.classes = self.index["classes"]
+        self.files = self.index["files"]
+        self.shards = [np.load(os.path.join(path, s["file"]), mmap_mode="c")
+                       for s in self.index["shards"]]
+
+    def windows(self, file_idx: int) -> np.ndarray:
+        """All windows of one recording as a view into its shard."""
+        meta = self.files[file_idx]
+        return self.shards[meta["shard"]][meta["start"]:meta["start"] + meta["n_windows"]]
+
+    def window(self, file_idx: int, win_idx: int = 0) -> np.ndarray:
+        meta = self.files[file_idx]
+        return self.shards[meta["shard"]][meta["start"] + win_idx]
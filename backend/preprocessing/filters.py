@@ -1,31 +1,121 @@
+from functools import lru_cache
+
 import numpy as np
-from scipy.signal import butter, filtfilt, iirnotch, spectrogram
+from scipy.signal import (
+    butter, iirnotch, spectrogram, tf2sos, sosfilt, sosfilt_zi, sosfiltfilt,
+)
 
-def notch_and_bandpass(x: np.ndarray, fs: int,
-                       notch_freq: float = 50.0,
-                       band: tuple = (1, 40)) -> np.ndarray:
-    b_notch, a_notch = iirnotch(notch_freq, Q=30, fs=fs)
-    x_f = filtfilt(b_notch, a_notch, x, axis=1)
+@lru_cache(maxsize=32)
+def design_filter_sos(fs: float, notch_freq: float, band: tuple) -> np.ndarray:
+    """
+    Notch + 4th-order Butterworth bandpass as one cascaded SOS array.
+    Memoized per (fs, notch, band); callers must not modify the returned array.
+    """
+    sections = []
+    if notch_freq:
+        b_notch, a_notch = iirnotch(notch_freq, Q=30, fs=fs)
+        sections.append(tf2sos(b_notch, a_notch))
+    sections.append(butter(4, [band[0] / (fs / 2), band[1] / (fs / 2)], btype="band", output="sos"))
+    return np.vstack(sections)
 
-    b_band, a_band = butter(4, [band[0] / (fs / 2), band[1] / (fs / 2)], btype="band")
-    x_f = filtfilt(b_band, a_band, x_f, axis=1)
+class FilterBank:
+    """
+    Cached notch + bandpass design with offline (zero-phase) and streaming (causal) modes.
 
-    return x_f
+    With ``dtype=np.float32`` coefficients and signal stay in single precision
+    (SOS sections are stable enough for that); by default scipy's float64 is used.
+    """
 
-def make_windows(x: np.ndarray, fs: int, window_sec: float, overlap: float = 0.5):
-    window_size = int(window_sec * fs)
-    step = int(window_size * (1 - overlap))
+    def __init__(self, fs: float, notch_freq: float = 50.0, band: tuple = (1, 40), dtype=None):
+        self.fs = float(fs)
+        self.dtype = dtype
+        sos = design_filter_sos(self.fs, notch_freq, tuple(float(b) for b in band))
+        self.sos = sos if dtype is None else sos.astype(dtype)
+
+    def filtfilt(self, x: np.ndarray) -> np.ndarray:
+        """Zero-phase filtering of a whole recording (ch, samples)."""
+        if self.dtype is not None:
+            x = np.asarray(x, dtype=self.dtype)
+        return sosfiltfilt(self.sos, x, axis=1)
+
+    def stream(self) -> "StreamingFilter":
+        return StreamingFilter(self.sos)
+
+class StreamingFilter:
+    """
+    Causal ``sosfilt`` that carries the filter state between chunks, so a live
+    stream is filtered incrementally without re-filtering its history.
+    """
 
-    windows = []
-    n_samples = x.shape[1]
+    def __init__(self, sos: np.ndarray):
+        self.sos = sos
+        self.zi = None
 
+    def reset(self):
+        self.zi = None
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """Filter the next (ch, n) chunk."""
+        if self.zi is None:
+            # steady state for the first sample of each channel, avoids a start-up transient
+            zi0 = sosfilt_zi(self.sos).astype(self.sos.dtype)  # (n_sections, 2)
+            self.zi = zi0[:, None, :] * chunk[None, :, :1].astype(self.sos.dtype)
+        y, self.zi = sosfilt(self.sos, chunk, axis=1, zi=self.zi)
+        return y
+
+class StreamingDecimator:
+    """
+    Chunk-by-chunk decimation by an integer ``factor``: causal 8th-order
+    Butterworth anti-alias lowpass at 80% of the new Nyquist, then every
+    ``factor``-th sample. Filter state and sample phase carry across chunks,
+    so the output equals decimating the concatenated stream in one go.
+    """
+
+    def __init__(self, fs: float, factor: int):
+        self.factor = max(1, int(factor))
+        self.fs_out = fs / self.factor
+        self.filter = None
+        if self.factor > 1:
+            self.filter = StreamingFilter(butter(8, 0.8 / self.factor, output="sos"))
+        self.phase = 0  # index in the next chunk of the next kept sample
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        if self.filter is None:
+            return chunk
+        y = self.filter.process(chunk)[:, self.phase::self.factor]
+        self.phase = (self.phase - chunk.shape[1]) % self.factor
+        return y
+
+def notch_and_bandpass(x: np.ndarray, fs: int,
+                       notch_freq: float = 50.0,
+                       band: tuple = (1, 40), dtype=None) -> np.ndarray:
+    """Zero-phase notch + bandpass. ``dtype=np.float32`` keeps the result in single precision."""
+    return FilterBank(fs, notch_freq, band, dtype=dtype).filtfilt(x)
+
+def window_geometry(fs: int, window_sec: float, overlap: float):
+    """(window_size, step) in samples, as used by make_windows."""
+    window_size = int(window_sec * fs)
+    step = int(window_size * (1 - overlap))
     if step <= 0:
         step = window_size
+    return window_size, step
+
+def count_windows(n_samples: int, fs: int, window_sec: float, overlap: float) -> int:
+    window_size, step = window_geometry(fs, window_sec, overlap)
+    return 0 if n_samples < window_size else (n_samples - window_size) // step + 1
 
-    for start in range(0, n_samples - window_size + 1, step):
-        windows.append(x[:, start:start + window_size])
+def make_windows(x: np.ndarray, fs: int, window_sec: float, overlap: float = 0.5):
+    """
+    Overlapping windows of ``x`` as a read-only strided view ``(n_windows, ch, window_size)``.
+    No window data is copied.
+    """
+    window_size, step = window_geometry(fs, window_sec, overlap)
 
-    return np.stack(windows) if windows else np.empty((0, x.shape[0], window_size))
+    if x.shape[1] < window_size:
+        return np.empty((0, x.shape[0], window_size), dtype=x.dtype)
+
+    view = np.lib.stride_tricks.sliding_window_view(x, window_size, axis=1)  # (ch, n, win)
+    return view[:, ::step].transpose(1, 0, 2)
 
 def to_spectrogram(x: np.ndarray, fs: int,
                    n_fft: int = 128, hop_length: int = 64):
@@ -38,3 +128,87 @@ def to_spectrogram(x: np.ndarray, fs: int,
         )
         specs.append(Sxx)
     return np.array(specs)
+
+def batch_spectrograms(wins: np.ndarray, fs: int,
+                       n_fft: int = 128, hop_length: int = 64) -> np.ndarray:
+    """
+    ``to_spectrogram`` for a whole window batch in one vectorized STFT.
+    ``wins``: (n_windows, ch, samples) -> (n_windows, ch, F, T).
+    """
+    _, _, Sxx = spectrogram(
+        wins, fs,
+        nperseg=n_fft,
+        noverlap=n_fft - hop_length,
+        axis=-1
+    )
+    return Sxx
+
+def normalize_windows(S: np.ndarray, use_spectrograms: bool = True) -> np.ndarray:
+    """Per-window z-score, same statistics as the per-window loop in app.predict."""
+    if use_spectrograms:
+        # S: (n, ch, F, T), one mean/std per window; reducing the flattened rows
+        # keeps the summation order (and so the bits) of the per-window loop
+        flat = S.reshape(S.shape[0], -1)
+        mean = flat.mean(axis=1).reshape(-1, 1, 1, 1)
+        std = flat.std(axis=1).reshape(-1, 1, 1, 1)
+        return (S - mean) / (std + 1e-6)
+    # S: (n, ch, samples), one mean/std per channel; model input is (n, ch, 1, samples)
+    S = (S - S.mean(axis=2, keepdims=True)) / (S.std(axis=2, keepdims=True) + 1e-6)
+    return S[:, :, None, :]
+
+def shared_window_spectrograms(x: np.ndarray, fs: int, window_sec: float, overlap: float,
+                               n_fft: int = 128, hop_length: int = 64,
+                               max_windows: int = None):
+    """
+    Per-window spectrograms cut from one STFT of the whole recording.
+
+    When the window step is a multiple of ``hop_length`` every STFT frame of a
+    window is also a frame of the full-recording STFT, so frames shared by
+    overlapping windows are computed once. Returns a read-only
+    ``(n_windows, ch, F, T)`` view on the frame axis, or None when the window
+    geometry does not line up with the hop (caller falls back to per-window STFT).
+    """
+    window_size = int(window_sec * fs)
+    step = int(window_size * (1 - overlap))
+    if step <= 0:
+        step = window_size
+    if step % hop_length or window_size < n_fft or x.shape[1] < window_size:
+        return None
+
+    n_windows = (x.shape[1] - window_size) // step + 1
+    if max_windows is not None:
+        n_windows = min(n_windows, max_windows)
+    span = (n_windows - 1) * step + window_size
+
+    _, _, Sxx = spectrogram(
+        x[:, :span], fs,
+        nperseg=n_fft,
+        noverlap=n_fft - hop_length,
+        axis=-1
+    )  # (ch, F, frames)
+    frames_per_window = (window_size - n_fft) // hop_length + 1
+    view = np.lib.stride_tricks.sliding_window_view(Sxx, frames_per_window, axis=-1)
+    # (ch, F, n_frames, T) -> every (step / hop)-th start -> (n_windows, ch, F, T)
+    return view[:, :, ::step // hop_length][:, :, :n_windows].transpose(2, 0, 1, 3)
+
+def recording_to_inputs(x: np.ndarray, fs: int, window_sec: float, overlap: float,
+                        n_fft: int, hop_length: int, use_spectrograms: bool = True,
+                        max_windows: int = None, shared_stft: bool = False) -> np.ndarray:
+    """
+    Filtered recording (ch, samples) -> normalized model inputs (n_windows, ch, F, T).
+    Falls back to one all-zero window when the recording is shorter than a window.
+    ``shared_stft`` cuts the windows out of a single whole-recording STFT.
+    """
+    if use_spectrograms and shared_stft:
+        S = shared_window_spectrograms(x, fs, window_sec, overlap, n_fft, hop_length, max_windows)
+        if S is not None:
+            return normalize_windows(S)
+
+    wins = make_windows(x, fs, window_sec, overlap)
+    if wins.shape[0] == 0:
+        wins = np.zeros((1, x.shape[0], int(window_sec * fs)), dtype=x.dtype)
+    wins = wins[:max_windows]
+
+    if use_spectrograms:
+        return normalize_windows(batch_spectrograms(wins, fs, n_fft, hop_length))
+    return normalize_windows(wins, use_spectrograms=False)
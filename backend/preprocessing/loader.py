@@ -2,9 +2,37 @@
 from pathlib import Path
 import numpy as np
 import pandas as pd
-from scipy.io import loadmat
-import mne
-from typing import Tuple, List, Optional
+from typing import Iterator, Tuple, List, Optional
+
+from config import USE_DECODE_CACHE, DECODE_CACHE_DIR, DECODE_CACHE_MAX_BYTES
+from .decode_cache import DecodeCache
+
+# extensions whose decode is worth caching (text parsing / full-file reads)
+CACHEABLE_EXTS = {".eea", ".csv", ".txt"}
+
+_DECODE_CACHE = None
+
+# standard 10-20 montage order used when a 19-channel file carries no names
+DEFAULT_CH_NAMES_19 = [
+    "Fp1", "Fp2", "F7", "F3", "Fz", "F4", "F8", "T3", "C3", "Cz",
+    "C4", "T4", "T5", "P3", "Pz", "P4", "T6", "O1", "O2",
+]
+
+
+# .eea recordings: 16 channels stored one after another, 60 s at 128 Hz each
+EEA_CH_NAMES = [
+    "F7", "F3", "F4", "F8", "T3", "C3", "Cz", "C4",
+    "T4", "T5", "P3", "Pz", "P4", "T6", "O1", "O2",
+]
+EEA_FS = 128.0
+
+
+def get_decode_cache() -> DecodeCache:
+    """Process-wide decode cache, created on first use."""
+    global _DECODE_CACHE
+    if _DECODE_CACHE is None:
+        _DECODE_CACHE = DecodeCache(DECODE_CACHE_DIR, max_bytes=DECODE_CACHE_MAX_BYTES)
+    return _DECODE_CACHE
 
 def read_eea_try_text(filepath: str) -> Tuple[np.ndarray, float, List[str]]:
     """Try reading .eea file as text/CSV style."""
@@ -18,7 +46,7 @@ def read_eea_try_text(filepath: str) -> Tuple[np.ndarray, float, List[str]]:
         pass
 
     try:
-        df = pd.read_csv(filepath, delim_whitespace=True, header=None)
+        df = pd.read_csv(filepath, sep=r"\s+", header=None)
         arr = df.values.T.astype("float32")
         ch_names = [f"C{i}" for i in range(arr.shape[0])]
         return arr, None, ch_names
@@ -33,12 +61,14 @@ def _read_any(filepath: str, channels: Optional[List[str]] = None, fs_fallback:
     ext = p.suffix.lower()
 
     if ext == ".edf":
+        import mne  # EDF only; kept off the server start-up path
         raw = mne.io.read_raw_edf(filepath, preload=True, verbose=False)
         x = raw.get_data()
         fs = float(raw.info["sfreq"])
         ch_names = raw.ch_names
 
     elif ext == ".mat":
+        from scipy.io import loadmat
         md = loadmat(filepath)
         arr = None
         for v in md.values():
@@ -60,36 +90,240 @@ def _read_any(filepath: str, channels: Optional[List[str]] = None, fs_fallback:
 
     elif ext == ".eea":
         try:
-            return read_eea_try_text(filepath)
+            x, fs, ch_names = read_eea_try_text(filepath)
         except Exception:
-            pass
-        try:
-            data = np.fromfile(filepath, dtype=np.float32)
-            x = data.reshape((1, -1)).astype("float32")
-            return x, float(fs_fallback), ["C0"]
-        except Exception as e:
-            raise ValueError("Unable to parse .eea file.") from e
+            try:
+                data = np.fromfile(filepath, dtype=np.float32)
+                x, fs, ch_names = data.reshape((1, -1)).astype("float32"), float(fs_fallback), ["C0"]
+            except Exception as e:
+                raise ValueError("Unable to parse .eea file.") from e
 
     else:
         raise ValueError(f"Unsupported extension: {ext}")
 
     # --- ensure channel names ---
-    if not ch_names or len(ch_names) != x.shape[0]:
-        if x.shape[0] == 19:
-            ch_names = DEFAULT_CH_NAMES_19
-        else:
-            ch_names = [f"Ch{i+1}" for i in range(x.shape[0])]
+    ch_names = _ensure_ch_names(ch_names, x.shape[0])
 
     # --- apply channel selection if requested ---
     if channels is not None:
-        idx = [ch_names.index(c) for c in channels if c in ch_names]
-        if len(idx) == 0:
-            raise ValueError("No requested channels found in file")
+        idx = _select_channels(ch_names, channels)
         x = x[idx]
         ch_names = [ch_names[i] for i in idx]
 
-    return x.astype("float32"), float(fs), ch_names
+    return x.astype("float32"), (float(fs) if fs is not None else None), ch_names
+
+def _ensure_ch_names(ch_names, n_channels: int) -> List[str]:
+    if not ch_names or len(ch_names) != n_channels:
+        if n_channels == 19:
+            return list(DEFAULT_CH_NAMES_19)
+        return [f"Ch{i+1}" for i in range(n_channels)]
+    return list(ch_names)
+
+def _select_channels(ch_names: List[str], channels: List[str]) -> List[int]:
+    idx = [ch_names.index(c) for c in channels if c in ch_names]
+    if len(idx) == 0:
+        raise ValueError("No requested channels found in file")
+    return idx
+
+def split_eea_layout(x: np.ndarray, ch_names: List[str]) -> Tuple[np.ndarray, float, List[str]]:
+    """
+    The real layout of a one-column .eea read: the text reader takes the first
+    sample as the column header, and the 16 channels are stored one after
+    another. Returns float32 ``(16, n)``, EEA_FS and EEA_CH_NAMES.
+    """
+    try:
+        head = [float(ch_names[0])]
+    except (ValueError, IndexError):
+        head = []
+    flat = np.concatenate([np.asarray(head, dtype=np.float32), np.asarray(x[0], dtype=np.float32)])
+    if flat.size % len(EEA_CH_NAMES):
+        raise ValueError(f"{flat.size} samples do not split into {len(EEA_CH_NAMES)} channels")
+    return flat.reshape(len(EEA_CH_NAMES), -1), EEA_FS, list(EEA_CH_NAMES)
+
+def load_eeg(filepath: str, channels: Optional[List[str]] = None, fs_fallback: int = 256,
+             use_cache: Optional[bool] = None, split_eea: bool = False):
+    """
+    Public wrapper for EEG loading.
+
+    Text-based formats are decoded once and then served from the binary
+    decode cache (read-only memory map) on later calls. ``split_eea=True``
+    returns one-column .eea files in their 16-channel layout (``split_eea_layout``);
+    the default keeps the single column the CNN-BiLSTM (in_channels=1) was
+    trained on.
+    """
+    if not (split_eea and Path(filepath).suffix.lower() == ".eea"):
+        return _load_cached(filepath, channels, fs_fallback, use_cache)
+
+    # select among the split channels, not the single column
+    x, fs, ch_names = _load_cached(filepath, None, fs_fallback, use_cache)
+    if x.shape[0] == 1:
+        x, fs, ch_names = split_eea_layout(x, ch_names)
+    if channels is not None:
+        idx = _select_channels(ch_names, channels)
+        x, ch_names = x[idx], [ch_names[i] for i in idx]
+    return x, fs, ch_names
+
+def _load_cached(filepath, channels, fs_fallback, use_cache):
+    if use_cache is None:
+        use_cache = USE_DECODE_CACHE
+    if not use_cache or Path(filepath).suffix.lower() not in CACHEABLE_EXTS:
+        return _read_any(filepath, channels=channels, fs_fallback=fs_fallback)
+
+    cache = get_decode_cache()
+    key = cache.key_for(filepath, Path(filepath).suffix.lower(), channels, fs_fallback)
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+
+    x, fs, ch_names = _read_any(filepath, channels=channels, fs_fallback=fs_fallback)
+    try:
+        cache.put(key, x, fs, ch_names)
+    except OSError as e:
+        print("⚠️ Could not write decode cache:", e)
+    return x, fs, ch_names
+
+
+# =============================
+# Chunked reading (bounded memory)
+# =============================
+def iter_eeg_chunks(filepath: str, chunk_sec: float, channels: Optional[List[str]] = None,
+                    fs_fallback: int = 256) -> Iterator[Tuple[np.ndarray, Optional[float], List[str]]]:
+    """
+    Yield ``(chunk, fs, ch_names)`` blocks of ``chunk_sec`` seconds.
+
+    Only one block is resident at a time: EDF is opened with preload=False,
+    .mat loads just the signal variable, text formats are parsed with a
+    chunked reader (or sliced from the decode cache memory map when the file
+    has been decoded before). Channel selection is applied while reading.
+    ``chunk`` is float32 ``(ch, n)``; the last block may be shorter. ``fs``
+    mirrors what ``load_eeg`` reports for the same file.
+    """
+    ext = Path(filepath).suffix.lower()
+
+    if ext == ".edf":
+        yield from _iter_edf(filepath, chunk_sec, channels)
+        return
+
+    if ext == ".mat":
+        x, ch_names = _read_mat_signal(filepath)
+        yield from _iter_array(x, float(fs_fallback), ch_names, chunk_sec, channels, fs_fallback)
+        return
+
+    if ext in CACHEABLE_EXTS:
+        if USE_DECODE_CACHE:
+            cache = get_decode_cache()
+            hit = cache.get(cache.key_for(filepath, ext, None, fs_fallback))
+            if hit is not None:
+                x, fs, ch_names = hit
+                yield from _iter_array(x, fs, ch_names, chunk_sec, channels, fs_fallback)
+                return
+        yield from _iter_text(filepath, ext, chunk_sec, channels, fs_fallback)
+        return
+
+    raise ValueError(f"Unsupported extension: {ext}")
+
+def read_eeg_head(filepath: str, max_sec: float, channels: Optional[List[str]] = None,
+                  fs_fallback: int = 256):
+    """Read only the first ``max_sec`` seconds of a recording via ``iter_eeg_chunks``."""
+    parts, fs, ch_names, n = [], None, None, 0
+    for chunk, fs, ch_names in iter_eeg_chunks(filepath, max_sec, channels, fs_fallback):
+        limit = int(max_sec * (fs or fs_fallback))
+        parts.append(chunk[:, :limit - n])
+        n += parts[-1].shape[1]
+        if n >= limit:
+            break
+    if not parts:
+        raise ValueError("Recording contains no samples")
+    return np.concatenate(parts, axis=1), fs, ch_names
+
+def _chunk_samples(chunk_sec: float, fs: Optional[float], fs_fallback: int) -> int:
+    return max(1, int(round(chunk_sec * (fs or fs_fallback))))
+
+def _iter_array(x, fs, ch_names, chunk_sec, channels, fs_fallback):
+    if channels is not None:
+        ch_names = _ensure_ch_names(ch_names, x.shape[0])
+        idx = _select_channels(ch_names, channels)
+        ch_names = [ch_names[i] for i in idx]
+    else:
+        idx = None
+    step = _chunk_samples(chunk_sec, fs, fs_fallback)
+    for start in range(0, x.shape[1], step):
+        block = x[:, start:start + step]
+        if idx is not None:
+            block = block[idx]
+        yield np.asarray(block, dtype=np.float32), fs, ch_names
+
+def _iter_edf(filepath, chunk_sec, channels):
+    import mne
+    raw = mne.io.read_raw_edf(filepath, preload=False, verbose=False)
+    fs = float(raw.info["sfreq"])
+    ch_names = _ensure_ch_names(raw.ch_names, len(raw.ch_names))
+    idx = _select_channels(ch_names, channels) if channels is not None else list(range(len(ch_names)))
+    sel_names = [ch_names[i] for i in idx]
+    step = _chunk_samples(chunk_sec, fs, int(fs))
+    for start in range(0, raw.n_times, step):
+        stop = min(start + step, raw.n_times)
+        block = raw.get_data(picks=idx, start=start, stop=stop)
+        yield block.astype(np.float32), fs, sel_names
+
+def _read_mat_signal(filepath):
+    """Load only the largest 2D variable of a .mat file (same choice as ``load_eeg``)."""
+    from scipy.io import loadmat, whosmat
+    best = None
+    for name, shape, _ in whosmat(filepath):
+        if len(shape) == 2 and (best is None or np.prod(shape) > np.prod(best[1])):
+            best = (name, shape)
+    if best is None:
+        raise ValueError("No 2D array found in .mat file")
+    x = loadmat(filepath, variable_names=[best[0]])[best[0]].astype("float32", copy=False)
+    return x, [f"C{i}" for i in range(x.shape[0])]
+
+def _iter_text(filepath, ext, chunk_sec, channels, fs_fallback):
+    fs = None if ext == ".eea" else float(fs_fallback)
+    step = _chunk_samples(chunk_sec, fs, fs_fallback)
+
+    usecols = order = None
+    out_names = None
+    try:
+        if channels is not None:
+            # select at parse time: only the requested columns are converted
+            header = [str(c) for c in pd.read_csv(filepath, nrows=0).columns]
+            names = _ensure_ch_names(header, len(header))
+            idx = _select_channels(names, channels)
+            usecols = sorted(set(idx))
+            order = [usecols.index(i) for i in idx]  # usecols come back in file order
+            out_names = [names[i] for i in idx]
+        reader = pd.read_csv(filepath, usecols=usecols, chunksize=step)
+        first = next(reader)
+    except StopIteration:
+        return
+    except Exception:
+        if ext != ".eea":
+            raise
+        # same fallbacks as read_eea_try_text / _read_any, selection applied to their names
+        try:
+            reader = pd.read_csv(filepath, sep=r"\s+", header=None, chunksize=step)
+            first = next(reader)
+            first.columns = [f"C{i}" for i in range(first.shape[1])]
+        except Exception:
+            data = np.memmap(filepath, dtype=np.float32, mode="r").reshape((1, -1))
+            yield from _iter_array(data, float(fs_fallback), ["C0"], chunk_sec, channels, fs_fallback)
+            return
+        order = out_names = None
+        if channels is not None:
+            names = [str(c) for c in first.columns]
+            order = _select_channels(names, channels)
+            out_names = [names[i] for i in order]
+
+    if out_names is None:
+        out_names = [str(c) for c in first.columns]
+        if ext != ".eea":
+            out_names = _ensure_ch_names(out_names, len(out_names))
+
+    def block(df):
+        vals = df.values if order is None else df.values[:, order]
+        return vals.T.astype("float32")
 
-def load_eeg(filepath: str, channels: Optional[List[str]] = None, fs_fallback: int = 256):
-    """Public wrapper for EEG loading."""
-    return _read_any(filepath, channels=channels, fs_fallback=fs_fallback)
+    yield block(first), fs, out_names
+    for df in reader:
+        yield block(df), fs, out_names
@@ -0,0 +1,110 @@
+# preprocessing/online_windows.py
+from collections import deque
+
+import numpy as np
+from scipy.signal import spectrogram
+
+from .filters import FilterBank, normalize_windows
+
+
+class OnlineWindower:
+    """
+    Model windows from a pushed EEG stream, emitted as soon as they are complete.
+
+    Chunks are filtered causally (state carried across chunks) and turned into
+    STFT frames once each ``hop_length`` of new samples is there. The last
+    ``frames_per_window`` frames sit in a ring; every ``step`` samples a window
+    is cut from it and normalized like ``recording_to_inputs``. Window
+    spectrograms are therefore slices of one running STFT (as with
+    SHARED_STFT): every sample is filtered and transformed once, however much
+    the windows overlap. ``step_sec`` is rounded to whole hops.
+
+    With ``use_spectrograms=False`` the ring holds the last window of samples.
+    """
+
+    def __init__(self, fs: float, n_channels: int, window_sec: float, step_sec: float,
+                 n_fft: int = 256, hop_length: int = 64, notch: float = None, band: tuple = None,
+                 use_spectrograms: bool = True, dtype=np.float32):
+        self.fs = float(fs)
+        self.n_channels = int(n_channels)
+        self.dtype = np.dtype(dtype)
+        self.window_size = int(window_sec * fs)
+        self.use_spectrograms = use_spectrograms
+        unit = hop_length if use_spectrograms else 1
+        self.step = max(1, int(round(step_sec * fs / unit))) * unit
+        self.filter = FilterBank(fs, notch, band, dtype=self.dtype).stream() if band else None
+        self.n_samples = 0   # samples pushed so far
+        self.n_windows = 0   # windows emitted so far
+
+        if use_spectrograms:
+            if self.window_size < n_fft:
+                raise ValueError(f"Window of {self.window_size} samples is shorter than n_fft={n_fft}")
+            self.n_fft = n_fft
+            self.hop = hop_length
+            self.frames_per_window = (self.window_size - n_fft) // hop_length + 1
+            self._frames = deque(maxlen=self.frames_per_window)  # (ch, F) each
+            self._n_frames = 0
+        # samples not consumed yet: from the next frame start (spectrograms) or the last window
+        self._pending = np.empty((self.n_channels, 0), dtype=self.dtype)
+
+    @property
+    def step_sec(self) -> float:
+        return self.step / self.fs
+
+    def push(self, chunk: np.ndarray):
+        """
+        Add a (ch, n) chunk. Returns ``(inputs, ends)``: normalized model inputs
+        (n_windows, ch, F, T) completed by this chunk and the end sample of each.
+        """
+        chunk = np.asarray(chunk, dtype=self.dtype)
+        if chunk.ndim != 2 or chunk.shape[0] != self.n_channels:
+            raise ValueError(f"Expected a ({self.n_channels}, n) chunk, got {chunk.shape}")
+        if self.filter is not None:
+            chunk = self.filter.process(chunk).astype(self.dtype, copy=False)
+        start = self.n_samples
+        self.n_samples += chunk.shape[1]
+        if self.use_spectrograms:
+            specs, ends = self._push_frames(chunk)
+            inputs = normalize_windows(np.stack(specs)) if specs else None
+        else:
+            wins, ends = self._push_samples(chunk, start)
+            inputs = normalize_windows(np.stack(wins), use_spectrograms=False) if wins else None
+        if inputs is None:
+            inputs = np.empty((0,), dtype=self.dtype)
+        self.n_windows += len(ends)
+        return inputs, ends
+
+    def _push_frames(self, chunk):
+        pending = np.concatenate([self._pending, chunk], axis=1)
+        if pending.shape[1] < self.n_fft:
+            self._pending = pending
+            return [], []
+        n_new = (pending.shape[1] - self.n_fft) // self.hop + 1
+        span = (n_new - 1) * self.hop + self.n_fft
+        _, _, Sxx = spectrogram(pending[:, :span], self.fs, nperseg=self.n_fft,
+                                noverlap=self.n_fft - self.hop, axis=-1)  # (ch, F, n_new)
+        self._pending = pending[:, n_new * self.hop:]
+
+        specs, ends = [], []
+        frames_per_step = self.step // self.hop
+        for k in range(n_new):
+            self._frames.append(Sxx[:, :, k])
+            self._n_frames += 1
+            done = self._n_frames - self.frames_per_window
+            if done >= 0 and done % frames_per_step == 0:
+                specs.append(np.stack(self._frames, axis=-1))
+                ends.append(done * self.hop + self.window_size)
+        return specs, ends
+
+    def _push_samples(self, chunk, start):
+        buf = np.concatenate([self._pending, chunk], axis=1)
+        base = start - self._pending.shape[1]  # absolute index of buf[:, 0]
+        wins, ends = [], []
+        # window ends are window_size + k * step; start at the first one after ``start``
+        end = self.window_size + max(0, (start - self.window_size) // self.step + 1) * self.step
+        while end <= self.n_samples:
+            wins.append(buf[:, end - base - self.window_size:end - base])
+            ends.append(end)
+            end += self.step
+        self._pending = buf[:, -self.window_size:]
+        return wins, ends
@@ -0,0 +1,105 @@
+# preprocessing/recording_walk.py
+from typing import Iterator, Optional
+
+import numpy as np
+
+from .loader import iter_eeg_chunks
+from .filters import FilterBank, window_geometry, recording_to_inputs
+from .band_power import welch_psd, psd_band_power
+from .online_windows import OnlineWindower
+
+
+class RecordingWalk:
+    """
+    Model-input batches of a whole recording in bounded memory.
+
+    The file is read in ``chunk_sec`` blocks (``iter_eeg_chunks``), filtered
+    causally with the state carried across blocks and cut into windows by an
+    ``OnlineWindower`` stepping like ``make_windows``, so at most one block and
+    one batch are resident whatever the length. Unlike the offline path the
+    filter is causal (``sosfilt``, not ``sosfiltfilt``), so probabilities
+    differ slightly from a whole-recording ``notch_and_bandpass``.
+
+    Alongside, it keeps what the report needs from the whole signal: the
+    per-channel mean |x| and a running Welch PSD. ``fs`` and ``ch_names`` are
+    known once the first block is read; ``windows_total`` once the file is
+    exhausted (None if the caller stopped early).
+    """
+
+    def __init__(self, path: str, window_sec: float, overlap: float, n_fft: int, hop_length: int,
+                 notch: Optional[float], band: tuple, use_spectrograms: bool = True,
+                 dtype=np.float64, chunk_sec: float = 60.0, fs_fallback: int = 256,
+                 max_sec: Optional[float] = None):
+        self.path = path
+        self.window_sec, self.overlap = window_sec, overlap
+        self.n_fft, self.hop = n_fft, hop_length
+        self.notch, self.band = notch, band
+        self.use_spectrograms = use_spectrograms
+        self.dtype = np.dtype(dtype)
+        self.chunk_sec, self.fs_fallback, self.max_sec = chunk_sec, fs_fallback, max_sec
+        self.fs = None
+        self.ch_names = None
+        self.n_samples = 0
+        self.windows_total = None
+        self._abs_sum = None
+        self._psd_sum = None
+        self._psd_frames = 0
+
+    def batches(self, batch_windows: int) -> Iterator[np.ndarray]:
+        """Yield normalized inputs (n <= batch_windows, ch, F, T) in recording order."""
+        windower, filt, pending = None, None, []
+        limit = None
+        for chunk, fs, ch_names in iter_eeg_chunks(self.path, self.chunk_sec, fs_fallback=self.fs_fallback):
+            if windower is None:
+                self.fs, self.ch_names = float(fs or self.fs_fallback), ch_names
+                filt = FilterBank(self.fs, self.notch, self.band, dtype=self.dtype).stream()
+                _, step = window_geometry(self.fs, self.window_sec, self.overlap)
+                windower = OnlineWindower(self.fs, chunk.shape[0], self.window_sec, step / self.fs,
+                                          self.n_fft, self.hop, use_spectrograms=self.use_spectrograms,
+                                          dtype=self.dtype)
+                limit = int(self.max_sec * self.fs) if self.max_sec else None
+            if limit is not None:
+                chunk = chunk[:, :limit - self.n_samples]
+            if chunk.shape[1]:
+                x = filt.process(chunk.astype(self.dtype, copy=False))
+                self._observe(x)
+                inputs, ends = windower.push(x)
+                pending.extend(inputs[:len(ends)])
+            while len(pending) >= batch_windows:
+                yield np.stack(pending[:batch_windows])
+                del pending[:batch_windows]
+            if limit is not None and self.n_samples >= limit:
+                break
+
+        if windower is None:
+            raise ValueError("Recording contains no samples")
+        self.windows_total = max(1, windower.n_windows)
+        if pending:
+            yield np.stack(pending)
+        elif windower.n_windows == 0:
+            # shorter than one window: the offline path's all-zero fallback window
+            yield recording_to_inputs(np.zeros((windower.n_channels, 0), dtype=self.dtype), self.fs,
+                                      self.window_sec, self.overlap, self.n_fft, self.hop,
+                                      use_spectrograms=self.use_spectrograms)
+
+    def _observe(self, x: np.ndarray):
+        self.n_samples += x.shape[1]
+        abs_sum = np.abs(x).sum(axis=1)
+        self._abs_sum = abs_sum if self._abs_sum is None else self._abs_sum + abs_sum
+        nperseg = self.n_fft
+        if x.shape[1] >= nperseg:
+            frames = (x.shape[1] - nperseg) // (nperseg // 2) + 1
+            psd = welch_psd(x, self.fs, nperseg) * frames
+            self._psd_sum = psd if self._psd_sum is None else self._psd_sum + psd
+            self._psd_frames += frames
+
+    @property
+    def mean_abs(self) -> np.ndarray:
+        """Per-channel mean |x| of the filtered samples read so far."""
+        return self._abs_sum / max(1, self.n_samples)
+
+    def band_power(self):
+        """``welch_band_power`` of the samples read so far, from the running PSD (frames within blocks)."""
+        if self._psd_sum is None:
+            raise ValueError(f"Fewer than {self.n_fft} samples read")
+        return psd_band_power(self._psd_sum / self._psd_frames, self.fs, self.n_fft)
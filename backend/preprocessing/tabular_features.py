@@ -0,0 +1,166 @@
+# preprocessing/tabular_features.py
+"""
+Raw recordings -> the band-power / coherence features of the tabular model.
+
+The tabular schema (models/tabular_feature_names.pkl, uploads/patient_*.csv)
+has one ``AB.<X>.<band>.<letter>.<electrode>`` column per band and 10-20
+electrode (absolute power) and one ``COH.<X>.<band>.<letter>.<e1>.<letter>.<e2>``
+column per band and electrode pair (coherence). Both come out of one
+cross-spectral matrix per recording: Hann frames, 50% overlap, averaged
+like ``scipy.signal.welch`` / ``coherence``, then reduced to bands through
+``band_power.band_matrix``. Electrodes a recording does not have, and the
+non-EEG columns (age, IQ, ...), are left NaN.
+"""
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.signal import get_window
+
+from config import BANDPASS, NOTCH
+from .loader import load_eeg, EEA_FS
+from .filters import notch_and_bandpass
+from .band_power import band_matrix, _bands_key
+
+# band -> (low Hz, high Hz) of the tabular dataset; order is the AB.A ... AB.F order
+TABULAR_BANDS = {
+    "delta": (1, 4),
+    "theta": (4, 8),
+    "alpha": (8, 12),
+    "beta": (12, 25),
+    "highbeta": (25, 30),
+    "gamma": (30, 40),
+}
+TABULAR_BAND_NAMES = list(TABULAR_BANDS)
+
+# 10-10 names of the renamed 10-20 temporal/parietal sites
+_ELECTRODE_ALIASES = {"T7": "T3", "T8": "T4", "P7": "T5", "P8": "T6"}
+
+_AB_RE = re.compile(r"^AB\.[A-Z]\.(\w+)\.[a-z]\.(\w+)$")
+_COH_RE = re.compile(r"^COH\.[A-Z]\.(\w+)\.[a-z]\.(\w+)\.[a-z]\.(\w+)$")
+
+
+def electrode_key(name: str) -> str:
+    """Comparable electrode name: upper case, 'EEG ' / '-REF' decorations and 10-10 aliases removed."""
+    name = str(name).strip().upper()
+    name = re.sub(r"^EEG\s*", "", name)
+    name = re.sub(r"[-_ ](REF|LE|AV|A1|A2)$", "", name)
+    return _ELECTRODE_ALIASES.get(name, name)
+
+
+def load_recording(path: str, fs_fallback: float = EEA_FS) -> Tuple[np.ndarray, float, List[str]]:
+    """
+    ``load_eeg`` with the layout feature extraction needs: .eea files split into
+    their 16 channels (``loader.split_eea_layout``), EDF converted from volts.
+    Returns float32 ``(ch, n)`` in µV, fs, channel names.
+    """
+    x, fs, ch_names = load_eeg(path, fs_fallback=int(fs_fallback), split_eea=True)
+    if os.path.splitext(path)[1].lower() == ".edf":
+        x = x * 1e6
+    return np.asarray(x, dtype=np.float32), float(fs or fs_fallback), list(ch_names)
+
+
+def cross_spectra(x: np.ndarray, fs: float, nperseg: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Welch-averaged spectra of ``x`` (ch, n): one-sided PSD (ch, F), identical to
+    ``scipy.signal.welch`` defaults, and magnitude-squared coherence (ch, ch, F),
+    identical to ``scipy.signal.coherence`` with the same segments.
+    """
+    nperseg = min(nperseg, x.shape[-1])
+    step = nperseg // 2
+    frames = np.lib.stride_tricks.sliding_window_view(x, nperseg, axis=-1)[:, ::step]
+    frames = frames - frames.mean(axis=-1, keepdims=True)  # constant detrend
+    win = get_window("hann", nperseg).astype(x.dtype)
+    X = np.fft.rfft(frames * win, axis=-1)  # (ch, frames, F)
+
+    S = np.einsum("ikf,jkf->ijf", X, X.conj()) / X.shape[1]  # (ch, ch, F)
+    auto = np.real(np.einsum("iif->if", S))
+    psd = auto / (fs * float((win.astype(np.float64) ** 2).sum()))
+    psd[:, 1:-1 if nperseg % 2 == 0 else None] *= 2  # one-sided
+    with np.errstate(invalid="ignore", divide="ignore"):
+        coh = np.abs(S) ** 2 / (auto[:, None, :] * auto[None, :, :])
+    return psd, np.nan_to_num(coh, nan=0.0)
+
+
+def spectral_features(x: np.ndarray, fs: float, nperseg: int = 256,
+                      bands: Dict[str, Tuple[float, float]] = TABULAR_BANDS):
+    """
+    Per-band features of a filtered recording ``x`` (ch, n):
+    absolute power (ch, n_bands) as µV² integrated over the band,
+    relative power (ch, n_bands) as the share of the summed bands,
+    coherence (ch, ch, n_bands) averaged over the band's bins.
+    """
+    nperseg = min(nperseg, x.shape[-1])
+    psd, coh = cross_spectra(x, fs, nperseg)
+    W = band_matrix(float(fs), int(nperseg), _bands_key(bands))
+    absolute = psd @ ((W > 0) * (fs / nperseg))
+    total = absolute.sum(axis=-1, keepdims=True)
+    relative = np.divide(absolute, total, out=np.zeros_like(absolute), where=total > 0)
+    return absolute, relative, coh @ W
+
+
+class FeatureSchema:
+    """Maps per-channel spectral features onto the columns of a tabular feature list."""
+
+    def __init__(self, feature_names: List[str], bands: List[str] = TABULAR_BAND_NAMES):
+        self.feature_names = list(feature_names)
+        band_idx = {b: i for i, b in enumerate(bands)}
+        self.ab, self.coh = [], []  # (column, band, electrode[, electrode])
+        for col, name in enumerate(self.feature_names):
+            m = _AB_RE.match(name)
+            if m and m.group(1) in band_idx:
+                self.ab.append((col, band_idx[m.group(1)], electrode_key(m.group(2))))
+                continue
+            m = _COH_RE.match(name)
+            if m and m.group(1) in band_idx:
+                self.coh.append((col, band_idx[m.group(1)], electrode_key(m.group(2)), electrode_key(m.group(3))))
+        self.relative_names = ["RB" + self.feature_names[col][2:] for col, _, _ in self.ab]
+
+    @staticmethod
+    def _channel_index(ch_names: List[str]) -> Dict[str, int]:
+        ch = {}
+        for i, name in enumerate(ch_names):
+            ch.setdefault(electrode_key(name), i)
+        return ch
+
+    def row(self, ch_names: List[str], absolute: np.ndarray, coh: np.ndarray) -> np.ndarray:
+        """One float32 row in ``feature_names`` order; NaN where the recording has no data."""
+        ch = self._channel_index(ch_names)
+        out = np.full(len(self.feature_names), np.nan, dtype=np.float32)
+        for col, b, e in self.ab:
+            if e in ch:
+                out[col] = absolute[ch[e], b]
+        for col, b, e1, e2 in self.coh:
+            if e1 in ch and e2 in ch:
+                out[col] = coh[ch[e1], ch[e2], b]
+        return out
+
+    def relative_row(self, ch_names: List[str], relative: np.ndarray) -> np.ndarray:
+        """``RB.*`` relative-power values, in the order of ``relative_names``."""
+        ch = self._channel_index(ch_names)
+        return np.array([relative[ch[e], b] if e in ch else np.nan for _, b, e in self.ab], dtype=np.float32)
+
+
+def extract_recording(path: str, fs_fallback: float = EEA_FS, nperseg: int = 256,
+                      notch: Optional[float] = NOTCH, band: tuple = BANDPASS) -> dict:
+    """
+    Load, filter and reduce one recording (process-pool task, returns plain arrays).
+    Errors are returned in ``"error"`` so one bad file does not stop a batch.
+    """
+    t0 = time.process_time()
+    try:
+        x, fs, ch_names = load_recording(path, fs_fallback)
+        # keep the passband below Nyquist for low-rate recordings
+        band = (band[0], min(band[1], 0.45 * fs))
+        notch = notch if notch and notch < fs / 2 else None
+        x = notch_and_bandpass(x, fs, notch_freq=notch, band=band, dtype=np.float32)
+        absolute, relative, coh = spectral_features(x, fs, nperseg)
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}", "cpu_sec": time.process_time() - t0}
+    return {
+        "path": path, "fs": fs, "ch_names": ch_names, "n_samples": x.shape[1],
+        "absolute": absolute, "relative": relative, "coherence": coh,
+        "cpu_sec": time.process_time() - t0,
+    }
@@ -0,0 +1,82 @@
+# scripts/bench_backends.py
+"""
+Parity and latency/throughput of every inference backend in models.predictor.
+
+Windows come from dataset/test through the /predict preprocessing; each backend
+is compared with the eager model on the same windows.
+
+Run from backend/:  python -m scripts.bench_backends
+"""
+import os
+import glob
+import time
+import argparse
+
+import numpy as np
+import torch
+
+from config import (
+    BASE_DIR, MODEL_PATH, MODEL_CFG, FS_FALLBACK, NOTCH, BANDPASS, PIPELINE_DTYPE,
+    WINDOW_SEC, OVERLAP, N_FFT, HOP, SHARED_STFT, MAX_WINDOWS_FOR_INFER,
+)
+from preprocessing.loader import load_eeg
+from preprocessing.filters import notch_and_bandpass, recording_to_inputs
+from models.predictor import BACKENDS
+from models.registry import ModelRegistry
+
+
+def load_windows(dataset_dir):
+    batches = []
+    for path in sorted(glob.glob(os.path.join(dataset_dir, "**", "*.eea"), recursive=True)):
+        x, fs, _ = load_eeg(path, fs_fallback=FS_FALLBACK)
+        fs = fs or FS_FALLBACK
+        x = notch_and_bandpass(x, fs, notch_freq=NOTCH, band=BANDPASS, dtype=np.dtype(PIPELINE_DTYPE))
+        specs = recording_to_inputs(x, fs, WINDOW_SEC, OVERLAP, N_FFT, HOP,
+                                    max_windows=MAX_WINDOWS_FOR_INFER, shared_stft=SHARED_STFT)
+        batches.append(torch.as_tensor(specs, dtype=torch.float32))
+    return batches
+
+
+def run(runner, device, batches):
+    with torch.no_grad():
+        return [torch.softmax(runner(b.to(device)), dim=1).cpu() for b in batches]
+
+
+def main(args):
+    torch.set_num_threads(args.threads)
+    batches = load_windows(args.dataset_dir)
+    registry = ModelRegistry(MODEL_PATH, MODEL_CFG)
+    shape = batches[0].shape[1:]
+
+    eager, device = registry.get_runner(shape, "eager")
+    ref = run(eager, device, batches)
+    big = torch.cat(batches)[:args.batch]
+
+    print(f"recordings: {len(batches)}  windows/recording: {len(batches[0])}  window shape: {tuple(shape)}")
+    print(f"{'backend':<12}{'max|dp|':>10}{'agree':>8}{'ms/recording':>14}{'windows/s':>12}")
+    for backend in BACKENDS:
+        runner, dev = registry.get_runner(shape, backend)
+        probs = run(runner, dev, batches)  # also warms up
+        diff = max(float((p - r).abs().max()) for p, r in zip(probs, ref))
+        agree = np.mean([bool((p.argmax(1) == r.argmax(1)).all()) for p, r in zip(probs, ref)])
+
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            run(runner, dev, batches)
+        latency = (time.perf_counter() - t0) / (args.repeat * len(batches))
+
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            run(runner, dev, [big])
+        throughput = args.repeat * len(big) / (time.perf_counter() - t0)
+
+        print(f"{backend:<12}{diff:>10.2e}{agree:>8.0%}{1000 * latency:>14.2f}{throughput:>12.0f}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--dataset_dir", default=os.path.join(BASE_DIR, "dataset", "test"))
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--batch", type=int, default=256, help="Batch size for the throughput run")
+    p.add_argument("--threads", type=int, default=torch.get_num_threads())
+    main(p.parse_args())
@@ -0,0 +1,96 @@
+# scripts/bench_band_power.py
+"""
+Band-power explanation cost: the old full-length rfft + five masked means
+(app.predict before preprocessing.band_power) vs Welch and STFT band powers
+through the cached bin-to-band matrix.
+
+Reports time, peak traced memory, the largest difference in band percentage
+and whether the top-2 bands agree with the rfft reference.
+
+Run from backend/:  python -m scripts.bench_band_power --limit 20
+"""
+import os
+import glob
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+from scipy.signal import spectrogram
+
+from config import BASE_DIR, FS_FALLBACK, NOTCH, BANDPASS, N_FFT, HOP
+from preprocessing.loader import load_eeg
+from preprocessing.filters import notch_and_bandpass
+from preprocessing.band_power import BANDS, welch_band_power, stft_band_power, band_percentages
+
+
+def rfft_band_power(x, fs):
+    """The pre-band_power path: full-length rfft, one boolean mask + mean per band."""
+    freqs = np.fft.rfftfreq(x.shape[1], d=1 / fs)
+    fft_power = np.abs(np.fft.rfft(x, axis=1)) ** 2
+    return np.array([fft_power[:, (freqs >= f1) & (freqs <= f2)].mean() for f1, f2 in BANDS.values()])
+
+
+def stft_path(x, fs):
+    _, _, Sxx = spectrogram(x, fs, nperseg=N_FFT, noverlap=N_FFT - HOP, axis=-1)
+    return stft_band_power(Sxx, fs, N_FFT)[1]
+
+
+def measure(fn, x, fs):
+    t0 = time.perf_counter()
+    out = fn(x, fs)
+    dt = time.perf_counter() - t0
+    tracemalloc.start()  # separate run: tracing slows allocation-heavy code down
+    fn(x, fs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return np.asarray(out), dt, peak
+
+
+def top2(powers):
+    return set(np.argsort(powers)[-2:])
+
+
+def main(args):
+    files = sorted(glob.glob(os.path.join(args.dataset_dir, "**", "*.eea"), recursive=True))
+    files = files[:args.limit] if args.limit else files
+    fs = FS_FALLBACK
+    paths = {
+        "welch": lambda x, fs: welch_band_power(x, fs, nperseg=N_FFT)[1],
+        "stft": stft_path,
+    }
+    totals = {name: [0.0, 0, 0.0, 0] for name in ["rfft", *paths]}  # time, peak, max d%, top2 agree
+
+    for path in files:
+        x, _, _ = load_eeg(path, fs_fallback=fs)
+        n = x.shape[1] // args.channels * args.channels
+        x = np.asarray(x[:, :n]).reshape(args.channels, -1)
+        x = notch_and_bandpass(x, fs, notch_freq=NOTCH, band=BANDPASS, dtype=np.float32)
+
+        ref, dt, peak = measure(rfft_band_power, x, fs)
+        totals["rfft"][0] += dt
+        totals["rfft"][1] = max(totals["rfft"][1], peak)
+        ref_pct = np.array(list(band_percentages(ref).values()))
+        for name, fn in paths.items():
+            out, dt, peak = measure(fn, x, fs)
+            pct = np.array(list(band_percentages(out).values()))
+            t = totals[name]
+            t[0] += dt
+            t[1] = max(t[1], peak)
+            t[2] = max(t[2], float(np.abs(pct - ref_pct).max()))
+            t[3] += top2(out) == top2(ref)
+
+    print(f"{len(files)} recordings, {args.channels} channels, fs {fs}")
+    for name, (dt, peak, dpct, agree) in totals.items():
+        line = f"{name:6s} {1000 * dt / len(files):7.2f} ms/rec  peak {peak / 2 ** 20:6.2f} MiB"
+        if name != "rfft":
+            line += f"  max |d%| {dpct:4.2f}  top-2 agree {agree}/{len(files)}"
+        print(line)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--dataset_dir", default=os.path.join(BASE_DIR, "dataset"))
+    p.add_argument("--channels", type=int, default=16)
+    p.add_argument("--limit", type=int, default=0)
+    main(p.parse_args())
@@ -0,0 +1,88 @@
+# scripts/bench_csv_batch.py
+"""
+Tabular scoring throughput: one predict_csv_file call per patient (the /predict
+CSV path) vs score_csv_batch over a single multi-patient CSV, in rows/s, plus
+per-row agreement between the two.
+
+Rows are the sample patient CSVs in uploads/ with multiplicative noise. When
+models/tabular_model.pkl is missing, a RandomForest shaped like train_tabular's
+is fitted on those rows in a temp dir (never written to models/).
+
+Run from backend/:  python -m scripts.bench_csv_batch --rows 2000
+"""
+import os
+import glob
+import time
+import pickle
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.ensemble import RandomForestClassifier
+
+from config import UPLOAD_DIR
+import models.tabular_predictor as tp
+
+
+def make_rows(n_rows, seed=0):
+    base = pd.concat([pd.read_csv(p) for p in sorted(glob.glob(os.path.join(UPLOAD_DIR, "patient_*.csv")))])
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), n_rows)].reset_index(drop=True)
+    numeric = df.select_dtypes(include=[np.number]).columns
+    df[numeric] = df[numeric] * rng.uniform(0.8, 1.2, size=(n_rows, len(numeric)))
+    return df
+
+
+def ensure_model(tmp, df):
+    if os.path.exists(tp.MODEL_PATH):
+        return "models/tabular_model.pkl"
+    with open(tp.FEATURES_PATH, "rb") as f:
+        names = pickle.load(f)
+    scaler = joblib.load(tp.SCALER_PATH)
+    X = scaler.transform(df[names].fillna(0).values)
+    y = (df[names[6]].values > np.median(df[names[6]].values)).astype(int)  # arbitrary binary target
+    clf = RandomForestClassifier(n_estimators=200, random_state=42, n_jobs=1).fit(X, y)
+    tp.MODEL_PATH = os.path.join(tmp, "tabular_model.pkl")
+    joblib.dump(clf, tp.MODEL_PATH)
+    return "stand-in RandomForest(200) fitted on the benchmark rows"
+
+
+def main(args):
+    df = make_rows(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        print("model:", ensure_model(tmp, df))
+        tp.load_artifacts()
+
+        batch_csv = os.path.join(tmp, "batch.csv")
+        df.to_csv(batch_csv, index=False)
+        single = []
+        for i in range(min(args.single_rows, len(df))):
+            path = os.path.join(tmp, f"p{i}.csv")
+            df.iloc[[i]].to_csv(path, index=False)
+            single.append(path)
+
+        t0 = time.perf_counter()
+        ref = [tp.predict_csv_file(p, render_heatmap=False)["risk_confidence"] for p in single]
+        t_single = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        out = tp.score_csv_batch(batch_csv, chunk_rows=args.chunk_rows)
+        t_batch = time.perf_counter() - t0
+
+    risks = np.array([r["risk_confidence"] for r in out["rows"][:len(ref)]])
+    ref = np.array(ref)
+    print(f"per-file predict_csv_file  {len(single) / t_single:9.1f} rows/s  ({len(single)} files)")
+    print(f"score_csv_batch            {out['n_rows'] / t_batch:9.1f} rows/s  "
+          f"({out['n_rows']} rows, chunks of {args.chunk_rows}, {t_single / len(single) / (t_batch / out['n_rows']):.0f}x)")
+    print(f"max |d risk| {np.abs(risks - ref).max():.3f}, labels agree "
+          f"{int(sum(tp.risk_label(a) == tp.risk_label(b) for a, b in zip(risks, ref)))}/{len(ref)}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--rows", type=int, default=2000)
+    p.add_argument("--single_rows", type=int, default=100, help="Files scored one by one for the baseline")
+    p.add_argument("--chunk_rows", type=int, default=1000)
+    main(p.parse_args())
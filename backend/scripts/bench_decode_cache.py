@@ -0,0 +1,61 @@
+# scripts/bench_decode_cache.py
+"""
+Text-parse vs decode-cache-hit latency for every recording under dataset/.
+
+Run from backend/:  python -m scripts.bench_decode_cache
+"""
+import os
+import glob
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from config import BASE_DIR
+from preprocessing import loader
+from preprocessing.decode_cache import DecodeCache
+
+
+def main(args):
+    files = sorted(glob.glob(os.path.join(args.dataset_dir, "**", "*.eea"), recursive=True))
+    if args.limit:
+        files = files[:args.limit]
+    if not files:
+        raise SystemExit(f"No .eea files under {args.dataset_dir}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        loader._DECODE_CACHE = DecodeCache(tmp)
+
+        parse_t, miss_t, hit_t = [], [], []
+        for path in files:
+            t0 = time.perf_counter()
+            ref = loader.load_eeg(path, use_cache=False)
+            parse_t.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            loader.load_eeg(path)  # miss: parse + write
+            miss_t.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            x, fs, ch_names = loader.load_eeg(path)  # hit: mmap
+            np.asarray(x).sum()  # touch the pages so the hit is not just a lazy map
+            hit_t.append(time.perf_counter() - t0)
+
+            assert np.array_equal(ref[0], x) and ref[1] == fs and ref[2] == ch_names, path
+
+        stats = loader.get_decode_cache().stats()
+
+    ms = lambda v: 1000 * float(np.median(v))
+    print(f"files: {len(files)}  cached bytes: {stats['bytes'] / 1e6:.1f} MB")
+    print(f"text parse      median {ms(parse_t):8.2f} ms")
+    print(f"cache miss      median {ms(miss_t):8.2f} ms")
+    print(f"cache hit       median {ms(hit_t):8.2f} ms")
+    print(f"speedup (parse / hit): {np.median(parse_t) / np.median(hit_t):.1f}x")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--dataset_dir", default=os.path.join(BASE_DIR, "dataset"))
+    p.add_argument("--limit", type=int, default=0, help="Only benchmark the first N files")
+    main(p.parse_args())
@@ -0,0 +1,94 @@
+# scripts/bench_float32.py
+"""
+float64 vs float32 preprocessing: model-output parity and peak memory.
+
+For every recording the /predict preprocessing (filter -> windows -> spectrograms
+-> normalization) runs in both precisions; peak numpy allocation is measured with
+tracemalloc and the CNN-BiLSTM risk probabilities are compared. The run fails
+(exit status 1) when any recording's risk moves by more than ``--tol`` or lands
+on the other side of the 0.40 threshold, so it can gate PIPELINE_DTYPE="float32".
+
+Run from backend/:  python -m scripts.bench_float32
+"""
+import os
+import sys
+import glob
+import argparse
+import tracemalloc
+
+import numpy as np
+import torch
+
+from config import (
+    BASE_DIR, MODEL_PATH, MODEL_CFG, FS_FALLBACK, NOTCH, BANDPASS,
+    WINDOW_SEC, OVERLAP, N_FFT, HOP, SHARED_STFT, MAX_WINDOWS_FOR_INFER,
+)
+from preprocessing.loader import load_eeg
+from preprocessing.filters import notch_and_bandpass, recording_to_inputs
+from models.predictor import load_model
+
+
+def preprocess(x, fs, dtype):
+    x = notch_and_bandpass(x, fs, notch_freq=NOTCH, band=BANDPASS, dtype=dtype)
+    specs = recording_to_inputs(x, fs, WINDOW_SEC, OVERLAP, N_FFT, HOP,
+                                max_windows=MAX_WINDOWS_FOR_INFER, shared_stft=SHARED_STFT)
+    return torch.as_tensor(specs, dtype=torch.float32)
+
+
+def measured(x, fs, dtype):
+    tracemalloc.start()
+    out = preprocess(x, fs, dtype)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, peak
+
+
+def main(args):
+    files = sorted(glob.glob(os.path.join(args.dataset_dir, "**", "*.eea"), recursive=True))
+    files = files[:args.limit] if args.limit else files
+
+    model, device = None, None
+    peaks = {"float64": [], "float32": []}
+    max_diff, flips = 0.0, 0
+
+    for path in files:
+        x, fs, _ = load_eeg(path, fs_fallback=FS_FALLBACK)
+        fs = fs or FS_FALLBACK
+        x = np.array(x)  # off the decode-cache memory map, so both runs start alike
+
+        t64, p64 = measured(x, fs, np.float64)
+        t32, p32 = measured(x, fs, np.float32)
+        peaks["float64"].append(p64)
+        peaks["float32"].append(p32)
+
+        if model is None:
+            cfg = dict(MODEL_CFG, in_channels=t64.shape[1])
+            model, device = load_model(MODEL_PATH, cfg)
+        with torch.no_grad():
+            p_64 = torch.softmax(model(t64.to(device)), dim=1)[:, 1].mean().item()
+            p_32 = torch.softmax(model(t32.to(device)), dim=1)[:, 1].mean().item()
+        max_diff = max(max_diff, abs(p_64 - p_32))
+        flips += (p_64 >= 0.40) != (p_32 >= 0.40)
+
+    mb = lambda v: np.mean(v) / 1e6
+    print(f"files: {len(files)}")
+    print(f"peak preprocessing memory  float64 {mb(peaks['float64']):7.2f} MB   "
+          f"float32 {mb(peaks['float32']):7.2f} MB   "
+          f"({mb(peaks['float64']) / mb(peaks['float32']):.2f}x)")
+    print(f"max |risk prob diff|: {max_diff:.2e} (tol {args.tol:.0e})   label flips at 0.40: {flips}")
+    if not files:
+        print("❌ no recordings under", args.dataset_dir)
+        return 1
+    if max_diff > args.tol or flips:
+        print("❌ float32 preprocessing is not at parity with float64")
+        return 1
+    print("✅ float32 preprocessing at parity")
+    return 0
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--dataset_dir", default=os.path.join(BASE_DIR, "dataset", "test"))
+    p.add_argument("--limit", type=int, default=0)
+    p.add_argument("--tol", type=float, default=1e-4, help="max allowed |risk prob diff| per recording")
+    sys.exit(main(p.parse_args()))
@@ -0,0 +1,75 @@
+# scripts/bench_forest.py
+"""
+Tabular forest latency: sklearn predict_proba (the pickled model's n_jobs and
+n_jobs=1) vs the flat node-array export (models.flat_forest), from a single
+row up to a 10k-row batch, plus an exact-equality check of the probabilities.
+
+Uses models/tabular_model.pkl when present, otherwise the same stand-in
+RandomForest as bench_csv_batch (fitted in a temp dir).
+
+Run from backend/:  python -m scripts.bench_forest --sizes 1 16 256 1024 10000
+"""
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import joblib
+
+import models.tabular_predictor as tp
+from models.flat_forest import export_forest, FlatForest
+from scripts.bench_csv_batch import make_rows, ensure_model
+
+
+def best_ms(fn, X, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - t0)
+    return 1000 * min(times)
+
+
+def main(args):
+    df = make_rows(max(args.sizes))
+    with tempfile.TemporaryDirectory() as tmp:
+        print("model:", ensure_model(tmp, df))
+        tp.load_artifacts()
+        clf = tp.TABULAR_MODEL
+        X = tp.SCALER.transform(df[tp.FEATURE_NAMES].fillna(0).values)
+
+        t0 = time.perf_counter()
+        export_forest(clf, os.path.join(tmp, "forest"))
+        t_export = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        flat = FlatForest(os.path.join(tmp, "forest"))
+        t_load = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        joblib.load(tp.MODEL_PATH)
+        t_unpickle = time.perf_counter() - t0
+        print(f"{flat.n_trees} trees, {flat.meta['n_nodes']} nodes, depth {flat.max_depth}; "
+              f"export {t_export:.2f}s, load {1000 * t_load:.1f} ms (joblib.load {1000 * t_unpickle:.1f} ms)")
+
+        exact = np.array_equal(flat.predict_proba(X), clf.predict_proba(X))
+        print(f"predict_proba identical on {len(X)} rows: {exact}")
+
+        n_jobs = clf.n_jobs
+        print(f"{'rows':>6}  {'sklearn n_jobs=' + str(n_jobs):>18}  {'sklearn n_jobs=1':>17}  {'flat':>9}")
+        for n in args.sizes:
+            Xn = X[:n]
+            repeat = args.repeat if n <= 1024 else max(1, args.repeat // 5)
+            clf.n_jobs = n_jobs
+            t_sk = best_ms(clf.predict_proba, Xn, repeat)
+            clf.n_jobs = 1
+            t_sk1 = best_ms(clf.predict_proba, Xn, repeat)
+            t_flat = best_ms(flat.predict_proba, Xn, repeat)
+            print(f"{n:6d}  {t_sk:15.2f} ms  {t_sk1:14.2f} ms  {t_flat:6.2f} ms")
+        clf.n_jobs = n_jobs
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--sizes", type=int, nargs="+", default=[1, 16, 64, 256, 1024, 10000])
+    p.add_argument("--repeat", type=int, default=20)
+    main(p.parse_args())
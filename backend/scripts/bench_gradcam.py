@@ -0,0 +1,86 @@
+# scripts/bench_gradcam.py
+"""
+Grad-CAM latency and parity: the original one-GradCAM-per-window loop vs the
+batched path (hooks registered once, one forward/backward over all windows).
+
+The reference is the per-window loop on the unfused checkpoint (the
+activations the model was trained with); the batched path runs on the model
+serving uses for heatmaps (ModelRegistry.get_explainer), so fusing Conv+BN
+into it would show up here. Windows come from a real recording when --file is
+given, random otherwise. Exits non-zero if the averaged heatmaps differ by
+more than --atol.
+
+Run from backend/:  python -m scripts.bench_gradcam --file uploads/022w1.eea
+"""
+import sys
+import time
+import argparse
+
+import numpy as np
+import torch
+
+from config import (
+    MODEL_PATH, MODEL_CFG, FS_FALLBACK, NOTCH, BANDPASS, WINDOW_SEC, OVERLAP, N_FFT, HOP,
+    OPTIMIZE_MODEL,
+)
+from preprocessing.loader import load_eeg
+from preprocessing.filters import notch_and_bandpass, recording_to_inputs
+from models.predictor import load_model
+from models.registry import ModelRegistry
+from xai.gradcam_utils import compute_cams
+
+
+def load_windows(args):
+    if args.file:
+        x, fs, _ = load_eeg(args.file, fs_fallback=FS_FALLBACK)
+        fs = fs or FS_FALLBACK
+        x = notch_and_bandpass(x, fs, notch_freq=NOTCH, band=BANDPASS, dtype=np.float32)
+        specs = recording_to_inputs(x, fs, WINDOW_SEC, OVERLAP, N_FFT, HOP,
+                                    max_windows=args.windows, shared_stft=True)
+        return torch.as_tensor(specs, dtype=torch.float32)
+    samples = int(WINDOW_SEC * FS_FALLBACK)
+    shape = (MODEL_CFG.get("in_channels", 1), N_FFT // 2 + 1, (samples - N_FFT) // HOP + 1)
+    return torch.randn(args.windows, *shape)
+
+
+def ms_per_call(fn, repeat):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return 1000 * (time.perf_counter() - t0) / repeat
+
+
+def main(args):
+    batch = load_windows(args)
+    reference, device = load_model(MODEL_PATH, dict(MODEL_CFG, in_channels=batch.shape[1]), optimize=False)
+    registry = ModelRegistry(MODEL_PATH, MODEL_CFG, device=device, optimize=OPTIMIZE_MODEL)
+    model, _ = registry.get_explainer(batch.shape[1])
+    batch = batch.to(device)
+
+    ref = compute_cams(reference, batch, args.target, batched=False)
+    out = compute_cams(model, batch, args.target, batched=True)
+    diff_win = np.abs(ref - out).max()
+    diff_avg = np.abs(ref.mean(axis=0) - out.mean(axis=0)).max()
+
+    t_loop = ms_per_call(lambda: compute_cams(reference, batch, args.target, batched=False), args.repeat)
+    t_batch = ms_per_call(lambda: compute_cams(model, batch, args.target, batched=True), args.repeat)
+
+    print(f"windows: {tuple(batch.shape)}  target class: {args.target}  threads: {torch.get_num_threads()}")
+    print(f"per-window loop  {t_loop:.2f} ms")
+    print(f"batched          {t_batch:.2f} ms  ({t_loop / t_batch:.2f}x)")
+    print(f"max |dCAM| per window {diff_win:.1e}, averaged {diff_avg:.1e}")
+    if diff_avg > args.atol:
+        print("❌ batched Grad-CAM on the serving explainer does not match the unfused per-window loop")
+        sys.exit(1)
+    print("✅ parity ok")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--file", default=None, help="Recording to take windows from (default: random)")
+    p.add_argument("--windows", type=int, default=5, help="Windows per Grad-CAM call (/predict uses 5)")
+    p.add_argument("--target", type=int, default=1)
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--atol", type=float, default=1e-4)
+    main(p.parse_args())
@@ -0,0 +1,73 @@
+# scripts/bench_heatmap.py
+"""
+Heatmap rendering latency: the annotated matplotlib figures (150 dpi, colorbar,
+tight_layout) vs the LUT renderer in xai.heatmap_render, for a Grad-CAM-shaped
+(129 x 5) map and a CSV-shaped (5 x n) map. Also reports the cost of importing
+matplotlib in a fresh interpreter and how far the LUT is from matplotlib's turbo.
+
+Run from backend/:  python -m scripts.bench_heatmap
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+from config import N_FFT, FS_FALLBACK, WINDOW_SEC, HOP
+from xai.gradcam_utils import plot_gradcam_figure
+from xai.heatmap_render import render_heatmap_png, TURBO_LUT
+from models.tabular_predictor import plot_csv_figure
+
+
+def ms_per_call(fn, repeat):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return 1000 * (time.perf_counter() - t0) / repeat
+
+
+def import_ms(module):
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return 1000 * float(out.stdout.strip())
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    samples = int(WINDOW_SEC * FS_FALLBACK)
+    cam = rng.random((N_FFT // 2 + 1, (samples - N_FFT) // HOP + 1))
+    csv = rng.random((5, args.csv_time))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "h.png")
+        rows = [
+            ("gradcam", lambda: plot_gradcam_figure(cam, cam, out), lambda: render_heatmap_png(cam, out)),
+            ("csv", lambda: plot_csv_figure(csv, out), lambda: render_heatmap_png(csv, out)),
+        ]
+        for name, slow, fast in rows:
+            t_slow = ms_per_call(slow, args.repeat)
+            size_slow = os.path.getsize(out)
+            t_fast = ms_per_call(fast, args.repeat)
+            size_fast = os.path.getsize(out)
+            print(f"{name:8s} matplotlib {t_slow:7.2f} ms ({size_slow // 1024} KiB)   "
+                  f"LUT {t_fast:6.2f} ms ({size_fast // 1024} KiB)   {t_slow / t_fast:.1f}x")
+
+    print(f"import matplotlib.figure: {import_ms('matplotlib.figure'):.0f} ms  "
+          f"(xai.heatmap_render: {import_ms('xai.heatmap_render'):.0f} ms)")
+    try:
+        from matplotlib import colormaps
+        ref = np.round(colormaps["turbo"](np.linspace(0, 1, 256))[:, :3] * 255)
+        print(f"max |LUT - matplotlib turbo|: {int(np.abs(ref - TURBO_LUT).max())} / 255")
+    except ImportError:
+        pass
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--csv_time", type=int, default=200, help="Time columns of the CSV heatmap")
+    main(p.parse_args())
@@ -0,0 +1,76 @@
+# scripts/bench_online.py
+"""
+Online inference under concurrent sessions: N simulated devices each push
+--chunk_sec chunks of a recording in real time (or as fast as possible with
+--no_pace) into their own pipeline.open_online_session, all sharing the
+model through the micro-batcher, as /ws/infer sessions do.
+
+Reports per-window end-to-end latency (chunk received -> prediction ready),
+risk updates per second and whether every update stayed under one second.
+
+Run from backend/:  python -m scripts.bench_online --sessions 1 8 32 --seconds 20
+"""
+import os
+import glob
+import time
+import asyncio
+import argparse
+
+import numpy as np
+
+from config import BASE_DIR, FS_FALLBACK
+from preprocessing.loader import load_eeg
+import pipeline
+from models.online import OnlineMetrics
+
+
+async def run_device(x, fs, chunk, seconds, pace, metrics):
+    session = pipeline.open_online_session(fs, x.shape[0])
+    session.metrics = metrics
+    start = time.perf_counter()
+    n_updates = 0
+    for k, i in enumerate(range(0, min(x.shape[1], int(seconds * fs)), chunk)):
+        if pace:
+            # chunk k is complete on the device at (k + 1) * chunk / fs
+            await asyncio.sleep(max(0.0, start + (k + 1) * chunk / fs - time.perf_counter()))
+        n_updates += len(await session.push(x[:, i:i + chunk], time.perf_counter(), seq=k))
+    return n_updates
+
+
+async def run(recordings, fs, n_sessions, args):
+    metrics = OnlineMetrics(maxlen=1 << 20)
+    chunk = int(args.chunk_sec * fs)
+    t0 = time.perf_counter()
+    cpu0 = time.process_time()
+    updates = await asyncio.gather(*[
+        run_device(recordings[s % len(recordings)], fs, chunk, args.seconds, args.pace, metrics)
+        for s in range(n_sessions)
+    ])
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+    return metrics.stats(), sum(updates), wall, cpu
+
+
+def main(args):
+    files = sorted(glob.glob(os.path.join(args.dataset_dir, "**", "*.eea"), recursive=True))[:8]
+    recordings = [np.asarray(load_eeg(p, fs_fallback=FS_FALLBACK)[0]) for p in files]  # as /predict sees them
+    fs = FS_FALLBACK
+    pipeline.init_models()
+    print(f"{recordings[0].shape[0]} channel(s) at {fs} Hz, {args.chunk_sec:g} s chunks, "
+          f"{args.seconds:g} s per session, {'real-time' if args.pace else 'unpaced'}")
+    print(f"{'sessions':>8}  {'updates/s':>9}  {'p50 ms':>7}  {'p99 ms':>7}  {'max ms':>7}  {'CPU/stream-s':>12}  <1 s")
+    for n in args.sessions:
+        s, updates, wall, cpu = asyncio.run(run(recordings, fs, n, args))
+        print(f"{n:8d}  {updates / wall:9.1f}  {s['latency_ms_p50']:7.1f}  {s['latency_ms_p99']:7.1f}  "
+              f"{s['latency_ms_max']:7.1f}  {1000 * cpu / (n * args.seconds):9.1f} ms  "
+              f"{'yes' if s['latency_ms_max'] < 1000 else 'no'}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--dataset_dir", default=os.path.join(BASE_DIR, "dataset"))
+    p.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32])
+    p.add_argument("--seconds", type=float, default=20)
+    p.add_argument("--chunk_sec", type=float, default=0.25)
+    p.add_argument("--no_pace", dest="pace", action="store_false")
+    main(p.parse_args())
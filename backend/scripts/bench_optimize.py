@@ -0,0 +1,68 @@
+# scripts/bench_optimize.py
+"""
+Per-window latency before/after load_model(optimize=True) on
+MAX_WINDOWS_FOR_INFER-sized batches.
+
+"before" is the plain checkpoint under torch.no_grad (the old predict path);
+"after" fuses Conv+BN and runs under torch.inference_mode, optionally through
+one of the compiled backends.
+
+Run from backend/:  python -m scripts.bench_optimize --backend torchscript
+"""
+import time
+import argparse
+
+import torch
+
+from config import (
+    MODEL_PATH, MODEL_CFG, FS_FALLBACK, WINDOW_SEC, N_FFT, HOP, MAX_WINDOWS_FOR_INFER,
+    TORCH_INTRA_OP_THREADS, TORCH_INTER_OP_THREADS,
+)
+from models.predictor import load_model, build_backend, configure_threads, warmup
+
+
+def per_window_ms(fn, batch, repeat):
+    fn(batch)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(batch)
+    return 1000 * (time.perf_counter() - t0) / (repeat * len(batch))
+
+
+def main(args):
+    configure_threads(args.threads or TORCH_INTRA_OP_THREADS, TORCH_INTER_OP_THREADS)
+    samples = int(WINDOW_SEC * FS_FALLBACK)
+    shape = (args.in_channels, N_FFT // 2 + 1, (samples - N_FFT) // HOP + 1)
+    batch = torch.randn(MAX_WINDOWS_FOR_INFER, *shape)
+    cfg = dict(MODEL_CFG, in_channels=args.in_channels)
+
+    base, device = load_model(MODEL_PATH, cfg)
+    fast, _ = load_model(MODEL_PATH, cfg, device=device, optimize=True)
+    runner, run_device = build_backend(fast, device, args.backend, shape)
+    warmup(runner, run_device, shape, batch_sizes=(1, MAX_WINDOWS_FOR_INFER))
+
+    def before(x):
+        with torch.no_grad():
+            return base(x.to(device))
+
+    def after(x):
+        with torch.inference_mode():
+            return runner(x.to(run_device))
+
+    with torch.no_grad():
+        diff = (before(batch) - after(batch).cpu()).abs().max().item()
+    t_before = per_window_ms(before, batch, args.repeat)
+    t_after = per_window_ms(after, batch, args.repeat)
+
+    print(f"batch: {MAX_WINDOWS_FOR_INFER} x {shape}  threads: {torch.get_num_threads()}  backend: {args.backend}")
+    print(f"before  {t_before:.3f} ms/window")
+    print(f"after   {t_after:.3f} ms/window  ({t_before / t_after:.2f}x, max |dlogit| {diff:.1e})")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--backend", default="eager", help="eager | torchscript | int8 | compile")
+    p.add_argument("--in_channels", type=int, default=1)
+    p.add_argument("--repeat", type=int, default=200)
+    p.add_argument("--threads", type=int, default=None)
+    main(p.parse_args())
@@ -0,0 +1,77 @@
+# scripts/bench_spectrogram.py
+"""
+Per-window spectrogram loop (the old app.predict path) vs the batched engine,
+with and without the shared whole-recording STFT.
+
+The dataset .eea files hold 16 channels x 7680 samples back to back; the loader
+returns them as one long channel, so they are folded back to (16, n) here.
+
+Run from backend/:  python -m scripts.bench_spectrogram
+"""
+import os
+import glob
+import time
+import argparse
+
+import numpy as np
+
+from config import BASE_DIR, FS_FALLBACK, NOTCH, BANDPASS, WINDOW_SEC, OVERLAP, N_FFT, HOP
+from preprocessing.loader import load_eeg
+from preprocessing.filters import notch_and_bandpass, to_spectrogram, recording_to_inputs
+
+
+def loop_inputs(x, fs, max_windows):
+    """The pre-batching path: python windowing loop + one spectrogram call per channel."""
+    window_size = int(WINDOW_SEC * fs)
+    step = int(window_size * (1 - OVERLAP)) or window_size
+    wins = [x[:, s:s + window_size] for s in range(0, x.shape[1] - window_size + 1, step)]
+    wins = np.stack(wins)[:max_windows]
+    specs = []
+    for w in wins:
+        S = to_spectrogram(w, fs, n_fft=N_FFT, hop_length=HOP)
+        specs.append((S - S.mean()) / (S.std() + 1e-6))
+    return np.stack(specs, axis=0)
+
+
+def main(args):
+    files = sorted(glob.glob(os.path.join(args.dataset_dir, "**", "*.eea"), recursive=True))
+    files = files[:args.limit] if args.limit else files
+    fs = FS_FALLBACK
+
+    t_loop, t_batch, t_shared, n_windows = 0.0, 0.0, 0.0, 0
+    for path in files:
+        x, _, _ = load_eeg(path, fs_fallback=fs)
+        n = x.shape[1] // args.channels * args.channels
+        x = np.asarray(x[:, :n]).reshape(args.channels, -1)
+        x = notch_and_bandpass(x, fs, notch_freq=NOTCH, band=BANDPASS)
+
+        t0 = time.perf_counter()
+        ref = loop_inputs(x, fs, args.max_windows)
+        t_loop += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        out = recording_to_inputs(x, fs, WINDOW_SEC, OVERLAP, N_FFT, HOP, max_windows=args.max_windows)
+        t_batch += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        shared = recording_to_inputs(x, fs, WINDOW_SEC, OVERLAP, N_FFT, HOP,
+                                     max_windows=args.max_windows, shared_stft=True)
+        t_shared += time.perf_counter() - t0
+
+        assert np.array_equal(ref, out) and np.array_equal(ref, shared), path
+        n_windows += out.shape[0]
+
+    print(f"files: {len(files)}  windows: {n_windows}  input shape per window: {out.shape[1:]}")
+    print(f"loop     {1000 * t_loop / len(files):8.2f} ms/file")
+    print(f"batched  {1000 * t_batch / len(files):8.2f} ms/file")
+    print(f"shared   {1000 * t_shared / len(files):8.2f} ms/file")
+    print(f"speedup  {t_loop / t_batch:.1f}x batched, {t_loop / t_shared:.1f}x shared (outputs bit-identical)")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--dataset_dir", default=os.path.join(BASE_DIR, "dataset"))
+    p.add_argument("--channels", type=int, default=16)
+    p.add_argument("--max_windows", type=int, default=None, help="Default: all windows")
+    p.add_argument("--limit", type=int, default=0)
+    main(p.parse_args())
@@ -0,0 +1,88 @@
+# scripts/bench_stream_protocol.py
+"""
+/ws/stream wire cost per client: server CPU and bytes per second of stream
+for the JSON text frames vs the binary float32 / int16 frames
+(utils/stream_protocol.py), with and without decimation.
+
+A "stream second" is two 0.5 s chunks of a recording (the .eea files are
+16 channels at 128 Hz) or of synthetic EEG with --channels/--fs. CPU is
+process time of StreamSession.encode plus the serialization send_json /
+send_bytes do, so it is what each connected client costs the server.
+int16 rows also report the worst reconstruction error.
+
+Run from backend/:  python -m scripts.bench_stream_protocol --channels 32 --fs 256
+"""
+import json
+import time
+import argparse
+
+import numpy as np
+
+from preprocessing.tabular_features import load_recording
+from utils.stream_protocol import StreamFormat, StreamSession, decode_frame
+
+
+def chunks_of(x, fs, seconds):
+    step = int(fs / 2)
+    n = min(x.shape[1], int(seconds * fs)) // step * step
+    return [x[:, i:i + step] for i in range(0, n, step)]
+
+
+def wire(msg):
+    """What Starlette puts on the socket: send_json uses compact json.dumps."""
+    if isinstance(msg, bytes):
+        return msg
+    return json.dumps(msg, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def run(chunks, fs, kind, decimate, repeat):
+    best, frames = None, None
+    for _ in range(repeat):
+        session = StreamSession(StreamFormat(kind, decimate))
+        t0 = time.process_time()
+        frames = [wire(session.encode(c, fs)) for c in chunks]
+        dt = time.process_time() - t0
+        best = dt if best is None else min(best, dt)
+    return best, frames
+
+
+def main(args):
+    if args.recording:
+        x, fs, _ = load_recording(args.recording)
+    else:
+        fs = args.fs
+        t = np.arange(int(args.seconds * fs)) / fs
+        rng = np.random.default_rng(0)
+        x = (20 * np.sin(2 * np.pi * rng.choice([6, 10, 18], size=(args.channels, 1)) * t)
+             + 5 * rng.standard_normal((args.channels, t.size))).astype(np.float32)
+    chunks = chunks_of(np.asarray(x, dtype=np.float32), fs, args.seconds)
+    stream_sec = len(chunks) / 2
+    print(f"{x.shape[0]} channels at {fs:g} Hz, {stream_sec:g} s of stream ({len(chunks)} chunks)")
+    print(f"{'format':>7} {'decim':>5}  {'CPU ms/stream-s':>15}  {'bytes/s':>10}  {'vs json':>7}  note")
+
+    base_bytes = None
+    for decimate in args.decimate:
+        for kind in ("json", "f32", "i16"):
+            cpu, frames = run(chunks, fs, kind, decimate, args.repeat)
+            rate = sum(len(f) for f in frames) / stream_sec
+            if kind == "json" and decimate == 1:
+                base_bytes = rate
+            note = ""
+            if kind == "i16":
+                ref = StreamSession(StreamFormat("f32", decimate))
+                err = max(float(np.abs(decode_frame(f)[1] - decode_frame(ref.encode(c, fs))[1]).max())
+                          for f, c in zip(frames, chunks))
+                note = f"max |err| {err:.4f}"
+            print(f"{kind:>7} {decimate:5d}  {1000 * cpu / stream_sec:15.3f}  {rate:10.0f}  "
+                  f"{base_bytes / rate:6.1f}x  {note}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--recording", default=None, help="Stream this file instead of synthetic EEG")
+    p.add_argument("--channels", type=int, default=16)
+    p.add_argument("--fs", type=float, default=256)
+    p.add_argument("--seconds", type=float, default=30)
+    p.add_argument("--decimate", type=int, nargs="+", default=[1, 2])
+    p.add_argument("--repeat", type=int, default=5)
+    main(p.parse_args())
@@ -0,0 +1,28 @@
+# scripts/export_forest.py
+"""
+Export an already trained models/tabular_model.pkl to the flat node-array
+format served by models.tabular_predictor (train_tabular.py does this itself
+for new models).
+
+Run from backend/:  python -m scripts.export_forest
+"""
+import argparse
+
+import joblib
+
+import models.tabular_predictor as tp
+from models.flat_forest import export_forest
+from preprocessing.decode_cache import file_digest
+
+
+def main(args):
+    clf = joblib.load(args.model)
+    out = export_forest(clf, args.out_dir, model_digest=file_digest(args.model))
+    print(f"✅ {len(clf.estimators_)} trees -> {out}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--model", default=tp.MODEL_PATH)
+    p.add_argument("--out_dir", default=tp.FOREST_PATH)
+    main(p.parse_args())
@@ -0,0 +1,46 @@
+# scripts/export_model.py
+"""
+Export best.pt as a frozen TorchScript graph (dynamic batch axis),
+optionally with dynamic int8 quantization of the LSTM and Linear layers.
+The default output name (models/best[_int8].<C>x<F>x<T>.ts.pt) is the one
+serving loads for INFERENCE_BACKEND "torchscript" / "int8" at that window
+shape instead of tracing at startup; re-export after retraining.
+
+Run from backend/:
+    python -m scripts.export_model --in_channels 1 --freq_bins 129 --frames 5
+"""
+import argparse
+
+import torch
+
+from config import MODEL_PATH, MODEL_CFG
+from models.predictor import load_model, export_torchscript, quantize_int8, exported_path
+
+
+def main(args):
+    model, device = load_model(MODEL_PATH, dict(MODEL_CFG, in_channels=args.in_channels),
+                               device=torch.device("cpu"))
+    if args.int8:
+        model = quantize_int8(model)
+    example = torch.zeros(2, args.in_channels, args.freq_bins, args.frames)
+
+    window_shape = (args.in_channels, args.freq_bins, args.frames)
+    out = args.out or exported_path(MODEL_PATH, "int8" if args.int8 else "torchscript", window_shape)
+    scripted = export_torchscript(model, example, out)
+
+    # the batch axis must stay dynamic
+    with torch.no_grad():
+        for b in (1, 7, 64):
+            x = torch.randn(b, args.in_channels, args.freq_bins, args.frames)
+            assert torch.allclose(scripted(x), model(x), atol=1e-4), f"mismatch at batch {b}"
+    print("✅ Exported TorchScript model to", out)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--in_channels", type=int, default=1)
+    p.add_argument("--freq_bins", type=int, default=129, help="N_FFT // 2 + 1")
+    p.add_argument("--frames", type=int, default=5, help="STFT frames per window")
+    p.add_argument("--int8", action="store_true", help="Quantize LSTM/Linear to int8 before export")
+    p.add_argument("--out", default=None)
+    main(p.parse_args())
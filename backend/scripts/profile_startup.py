@@ -0,0 +1,62 @@
+# scripts/profile_startup.py
+"""
+Server start-up profile: import time of every module pulled in by
+``import app`` (``python -X importtime`` in a fresh interpreter), summed per
+top-level package and listed per module, then the warm-up time of each
+init_models() step.
+
+Modules that only rare paths need (mne for EDF, scipy.io for .mat,
+pytorch_grad_cam / torchvision / matplotlib for heatmaps) should not show up
+in the import list.
+
+Run from backend/:  python -m scripts.profile_startup --top 25
+"""
+import sys
+import argparse
+import subprocess
+from collections import defaultdict
+
+
+def import_times(module):
+    """[(module, self_us, cumulative_us)] from ``-X importtime`` in a new process."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cum_us)))
+    return rows
+
+
+def main(args):
+    rows = import_times(args.module)
+    total = sum(r[1] for r in rows)
+    per_package = defaultdict(int)
+    for name, self_us, _ in rows:
+        per_package[name.split(".")[0]] += self_us
+
+    print(f"import {args.module}: {total / 1e6:.2f}s, {len(rows)} modules")
+    print("\nper top-level package (self time):")
+    for pkg, us in sorted(per_package.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {us / 1e3:9.1f} ms  {100 * us / total:5.1f}%  {pkg}")
+    print("\nslowest modules (self time / cumulative):")
+    for name, self_us, cum_us in sorted(rows, key=lambda r: -r[1])[:args.top]:
+        print(f"  {self_us / 1e3:9.1f} ms  {cum_us / 1e3:9.1f} ms  {name}")
+    for lazy in ("mne", "scipy.io", "pytorch_grad_cam", "torchvision", "matplotlib"):
+        if any(name == lazy for name, _, _ in rows):
+            print(f"⚠️ {lazy} is imported at start-up")
+
+    if args.warmup:
+        import pipeline
+        report = pipeline.init_models()
+        print("\nwarm-up:", ", ".join(f"{k} {v:.2f}s" for k, v in report["seconds"].items()))
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--module", default="app")
+    p.add_argument("--top", type=int, default=20)
+    p.add_argument("--no_warmup", dest="warmup", action="store_false", help="Only profile imports")
+    main(p.parse_args())
@@ -0,0 +1,42 @@
+# tests/test_float32_pipeline.py
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from config import MODEL_PATH, MODEL_CFG, NOTCH, BANDPASS, WINDOW_SEC, OVERLAP, N_FFT, HOP
+from preprocessing.filters import notch_and_bandpass, recording_to_inputs
+from models.predictor import load_model, predict_windows
+
+PROB_TOL = 1e-4
+
+pytestmark = pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason="no trained checkpoint")
+
+
+def synthetic_recording(fs=256, seconds=30, seed=0):
+    """One channel of alpha + line noise + white noise, in microvolts."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(fs * seconds)) / fs
+    x = 20 * np.sin(2 * np.pi * 10 * t) + 5 * np.sin(2 * np.pi * 50 * t) + rng.normal(0, 8, t.size)
+    return x[None, :], fs
+
+
+def confidences(model, device, x, fs, dtype):
+    x = notch_and_bandpass(x, fs, notch_freq=NOTCH, band=BANDPASS, dtype=dtype)
+    inputs = recording_to_inputs(x, fs, WINDOW_SEC, OVERLAP, N_FFT, HOP)
+    assert inputs.dtype == dtype
+    preds = predict_windows(model, device, torch.as_tensor(inputs, dtype=torch.float32))
+    return np.array([p["confidence"] for p in preds]), [p["label"] for p in preds]
+
+
+def test_float32_preprocessing_matches_float64():
+    x, fs = synthetic_recording()
+    model, device = load_model(MODEL_PATH, dict(MODEL_CFG, in_channels=x.shape[0]))
+
+    conf64, labels64 = confidences(model, device, x, fs, np.float64)
+    conf32, labels32 = confidences(model, device, x, fs, np.float32)
+
+    assert len(conf64) > 1
+    np.testing.assert_allclose(conf32, conf64, rtol=0, atol=PROB_TOL)
+    assert labels32 == labels64
@@ -0,0 +1,33 @@
+# tests/test_gradcam_batched.py
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from config import MODEL_PATH, MODEL_CFG, WINDOW_SEC, OVERLAP, N_FFT, HOP
+from preprocessing.filters import recording_to_inputs
+from models.predictor import load_model
+
+pytest.importorskip("pytorch_grad_cam")
+from xai.gradcam_utils import compute_cams  # noqa: E402
+
+CAM_TOL = 1e-4
+
+pytestmark = pytest.mark.skipif(not os.path.exists(MODEL_PATH), reason="no trained checkpoint")
+
+
+@pytest.mark.parametrize("target_class", [0, 1])
+def test_batched_cams_match_per_window_loop(target_class):
+    fs = 256
+    x = np.random.default_rng(0).normal(0, 10, (1, fs * 12))
+    inputs = recording_to_inputs(x, fs, WINDOW_SEC, OVERLAP, N_FFT, HOP, max_windows=5)
+    windows = torch.as_tensor(inputs, dtype=torch.float32)
+    model, device = load_model(MODEL_PATH, dict(MODEL_CFG, in_channels=1), optimize=False)
+    windows = windows.to(device)
+
+    ref = compute_cams(model, windows, target_class, batched=False)
+    out = compute_cams(model, windows, target_class, batched=True)
+
+    assert out.shape == ref.shape == (windows.shape[0],) + tuple(windows.shape[2:])
+    np.testing.assert_allclose(out, ref, rtol=0, atol=CAM_TOL)
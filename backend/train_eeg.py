@@ -6,7 +6,8 @@ import torch.optim as optim
 from torch.utils.data import Dataset, DataLoader
 from tqdm import tqdm
 from preprocessing.loader import load_eeg
-from preprocessing.filters import notch_and_bandpass, make_windows, to_spectrogram
+from preprocessing.filters import notch_and_bandpass, recording_to_inputs
+from preprocessing.feature_store import build_feature_store, FeatureStore
 from models.cnn_bilstm import CNNBiLSTM
 
 # =============================
@@ -20,6 +21,7 @@ OVERLAP = 0.5
 N_FFT = 128
 HOP = 64
 USE_SPECTROGRAMS = True
+SHARED_STFT = True
 BATCH_SIZE = 16
 EPOCHS = 60
 LR = 5e-3
@@ -27,6 +29,32 @@ DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 DATASET_DIR = "dataset"
 MODEL_OUT = "models/best.pt"
+USE_FEATURE_STORE = True  # preprocess once into cache/features, train from memory maps
+FEATURE_STORE_DIR = os.path.join("cache", "features")
+
+# everything that changes the stored windows; a new value means a new store
+PREPROC_CFG = {
+    "fs_fallback": FS_FALLBACK, "notch": NOTCH, "bandpass": BANDPASS,
+    "window_sec": WINDOW_SEC, "overlap": OVERLAP, "n_fft": N_FFT, "hop": HOP,
+    "use_spectrograms": USE_SPECTROGRAMS,
+}
+
+# =============================
+# Preprocessing
+# =============================
+def preprocess_file(file_path, max_windows=None):
+    """Load one recording and return its normalized windows (n_windows, ch, F, T)."""
+    x, fs, _ = load_eeg(file_path, fs_fallback=FS_FALLBACK)
+    if fs is None:
+        fs = FS_FALLBACK
+
+    x = notch_and_bandpass(x, fs, NOTCH, BANDPASS)
+    S = recording_to_inputs(
+        x, fs, WINDOW_SEC, OVERLAP, N_FFT, HOP,
+        use_spectrograms=USE_SPECTROGRAMS, max_windows=max_windows,
+        shared_stft=SHARED_STFT
+    )  # (n_windows, ch, F, T)
+    return S.astype(np.float32)
 
 # =============================
 # Dataset Class
@@ -51,29 +79,25 @@ class EEGDataset(Dataset):
         file_path = self.samples[idx]
         label = self.labels[idx]
 
-        # load EEG
-        x, fs, _ = load_eeg(file_path, fs_fallback=FS_FALLBACK)
-        if fs is None:
-            fs = FS_FALLBACK
+        # pick first window (simplest)
+        w = preprocess_file(file_path, max_windows=1)[0]
+        return torch.tensor(w, dtype=torch.float32), label
 
-        # preprocess
-        x = notch_and_bandpass(x, fs, NOTCH, BANDPASS)
-        wins = make_windows(x, fs, WINDOW_SEC, OVERLAP)
-        if wins.shape[0] == 0:
-            wins = np.zeros((1, x.shape[0], int(WINDOW_SEC * fs)))
 
-        # pick first window (simplest)
-        w = wins[0]
+class FeatureStoreDataset(Dataset):
+    """Same samples as EEGDataset, read zero-copy from a prebuilt feature store."""
+    def __init__(self, root_dir, split):
+        path = build_feature_store(root_dir, FEATURE_STORE_DIR, split, PREPROC_CFG, preprocess_file)
+        self.store = FeatureStore(path)
+        self.classes = self.store.classes
+        self.labels = [f["label"] for f in self.store.files]
 
-        if USE_SPECTROGRAMS:
-            S = to_spectrogram(w, fs, n_fft=N_FFT, hop_length=HOP)  # (ch, F, T)
-            S = (S - S.mean()) / (S.std() + 1e-6)
-            tensor = torch.tensor(S, dtype=torch.float32)
-        else:
-            w_norm = (w - w.mean(axis=1, keepdims=True)) / (w.std(axis=1, keepdims=True) + 1e-6)
-            tensor = torch.tensor(w_norm[:, None, :], dtype=torch.float32)  # (ch, 1, T)
+    def __len__(self):
+        return len(self.labels)
 
-        return tensor, label
+    def __getitem__(self, idx):
+        # first window, as in EEGDataset
+        return torch.from_numpy(self.store.window(idx, 0)), self.labels[idx]
 
 # =============================
 # Training
@@ -96,11 +120,11 @@ def train_one_epoch(model, loader, criterion, optimizer):
         total += y.size(0)
     return total_loss / total, correct / total
 
-def evaluate(model, loader, criterion):
+def evaluate(model, loader, criterion, desc="Val"):
     model.eval()
     total_loss, correct, total = 0, 0, 0
     with torch.no_grad():
-        for X, y in tqdm(loader, desc="Val"):
+        for X, y in tqdm(loader, desc=desc):
             X, y = X.to(DEVICE), y.to(DEVICE)
             if X.ndim == 3:
                 X = X.unsqueeze(0)
@@ -115,9 +139,15 @@ def evaluate(model, loader, criterion):
 # =============================
 # Main
 # =============================
+def make_dataset(split):
+    root = os.path.join(DATASET_DIR, split)
+    return FeatureStoreDataset(root, split) if USE_FEATURE_STORE else EEGDataset(root)
+
 def main():
-    train_ds = EEGDataset(os.path.join(DATASET_DIR, "train"))
-    val_ds = EEGDataset(os.path.join(DATASET_DIR, "val"))
+    train_ds = make_dataset("train")
+    val_ds = make_dataset("val")
+    # held-out split, scored once with the best checkpoint after training
+    test_ds = make_dataset("test") if os.path.isdir(os.path.join(DATASET_DIR, "test")) else None
 
     train_loader = DataLoader(train_ds, batch_size=BATCH_SIZE, shuffle=True)
     val_loader = DataLoader(val_ds, batch_size=BATCH_SIZE, shuffle=False)
@@ -144,6 +174,12 @@ def main():
             torch.save(model.state_dict(), MODEL_OUT)
             print(f"✅ Saved best model to {MODEL_OUT} (val_acc={val_acc:.3f})")
 
+    if test_ds is not None and os.path.exists(MODEL_OUT):
+        model.load_state_dict(torch.load(MODEL_OUT, map_location=DEVICE))
+        test_loader = DataLoader(test_ds, batch_size=BATCH_SIZE, shuffle=False)
+        test_loss, test_acc = evaluate(model, test_loader, criterion, desc="Test")
+        print(f"Test loss={test_loss:.4f} acc={test_acc:.4f} (best checkpoint, {len(test_ds)} recordings)")
+
 if __name__ == "__main__":
     main()
 
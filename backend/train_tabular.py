@@ -10,6 +10,9 @@ from sklearn.metrics import classification_report, accuracy_score
 import joblib
 import pickle
 
+from models.flat_forest import export_forest
+from preprocessing.decode_cache import file_digest
+
 def find_label_column(df):
     candidates = ['main.disorder', 'specific.disorder', 'label', 'class', 'diagnosis']
     for c in candidates:
@@ -57,7 +60,10 @@ def main(args):
     print("Classification report:\n", classification_report(y_test, y_pred, target_names=le.classes_))
 
     os.makedirs(args.out_dir, exist_ok=True)
-    joblib.dump(clf, os.path.join(args.out_dir, "tabular_model.pkl"))
+    model_path = os.path.join(args.out_dir, "tabular_model.pkl")
+    joblib.dump(clf, model_path)
+    # flat node arrays for fast single-patient serving (models/tabular_predictor.py)
+    export_forest(clf, os.path.join(args.out_dir, "tabular_forest"), model_digest=file_digest(model_path))
     joblib.dump(scaler, os.path.join(args.out_dir, "tabular_scaler.pkl"))
     joblib.dump(le, os.path.join(args.out_dir, "tabular_label_encoder.pkl"))
     with open(os.path.join(args.out_dir, "tabular_feature_names.pkl"), "wb") as f:
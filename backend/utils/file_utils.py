@@ -1,16 +1,43 @@
+import asyncio
 import os
 import shutil
+import uuid
 from fastapi import UploadFile
 
-async def save_upload_file(upload_file: UploadFile, destination: str) -> str:
+_COPY_CHUNK = 1 << 20
+
+
+def _copy(src, file_path: str, hasher=None):
+    with open(file_path, "xb") as buffer:
+        if hasher is None:
+            shutil.copyfileobj(src, buffer, _COPY_CHUNK)
+        else:
+            for block in iter(lambda: src.read(_COPY_CHUNK), b""):
+                hasher.update(block)
+                buffer.write(block)
+
+
+async def save_upload_file(upload_file: UploadFile, destination: str, hasher=None) -> str:
     """
-    Save an uploaded EEG file to the destination folder.
-    Returns the saved file path.
+    Save an uploaded EEG file to the destination folder, off the event loop.
+    Returns the saved file path: a fresh uuid name with the upload's extension,
+    so concurrent uploads never collide; the caller removes it (``remove_upload``).
+    If given, ``hasher`` (e.g. ``hashlib.sha256()``) is fed the bytes as they are written.
     """
     os.makedirs(destination, exist_ok=True)
-    file_path = os.path.join(destination, upload_file.filename)
+    ext = os.path.splitext(upload_file.filename or "")[1]
+    file_path = os.path.join(destination, f"{uuid.uuid4().hex}{ext}")
+    try:
+        await asyncio.to_thread(_copy, upload_file.file, file_path, hasher)
+    except BaseException:
+        remove_upload(file_path)
+        raise
+    return file_path
 
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
 
-    return file_path
+def remove_upload(file_path: str):
+    """Delete a saved upload; already gone is fine."""
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,95 @@
+# utils/jobs.py
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from uuid import uuid4
+
+
+class JobQueue:
+    """
+    Bounded background pool for deferred work (heatmap rendering).
+
+    ``submit`` hands back a job id that ``status`` can be polled with. A key
+    that is already queued or running returns the existing job instead of a
+    new one. At most ``max_pending`` jobs may be queued or running; beyond
+    that ``submit`` returns None and the caller decides what to do. Finished
+    jobs are remembered (up to ``max_finished``) so clients can still poll them.
+    """
+
+    def __init__(self, workers: int = 1, max_pending: int = 32, max_finished: int = 1024):
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jobs")
+        self._jobs = OrderedDict()  # job_id -> {"status", "result", "error", "key"}
+        self._by_key = {}           # key -> job_id while queued or running
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def submit(self, key, fn, *args, on_done=None) -> Optional[str]:
+        """Run ``fn(*args)`` in the background; ``on_done(result)`` runs after success."""
+        with self._lock:
+            job_id = self._by_key.get(key)
+            if job_id is not None:
+                self.deduplicated += 1
+                return job_id
+            if len(self._by_key) >= self.max_pending:
+                self.rejected += 1
+                return None
+            job_id = uuid4().hex
+            self._jobs[job_id] = {"status": "queued", "result": None, "error": None, "key": key}
+            self._by_key[key] = job_id
+            self.submitted += 1
+
+        self._pool.submit(self._run, job_id, fn, args, on_done)
+        return job_id
+
+    def _run(self, job_id, fn, args, on_done):
+        with self._lock:
+            self._jobs[job_id]["status"] = "running"
+        try:
+            result = fn(*args)
+            if on_done is not None:
+                on_done(result)
+            update = {"status": "done", "result": result}
+        except Exception as e:
+            print("⚠️ Background job failed:", e)
+            update = {"status": "failed", "error": str(e)}
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(update)
+            if update["status"] == "failed":
+                self.failed += 1
+            self._by_key.pop(job["key"], None)
+            self._forget_finished()
+
+    def _forget_finished(self):
+        # caller holds self._lock; oldest finished jobs go first
+        finished = [j for j, job in self._jobs.items() if job["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def status(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {"job_id": job_id, "status": job["status"],
+                    "result": job["result"], "error": job["error"]}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._by_key),
+                "max_pending": self.max_pending,
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "rejected": self.rejected,
+                "failed": self.failed,
+            }
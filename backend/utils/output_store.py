@@ -0,0 +1,173 @@
+# utils/output_store.py
+import os
+import re
+import time
+import hashlib
+import threading
+from uuid import uuid4
+
+from config import OUTPUT_STORE_DIR, OUTPUT_MAX_BYTES, OUTPUT_TTL_SEC
+
+_HASH_CHUNK = 1 << 20
+_TMP_PREFIX = ".tmp_"
+_ARTIFACT_RE = re.compile(r"^\w+_[0-9a-f]{32}\.\w+$")  # what adopt() names files
+
+_OUTPUT_STORE = None
+
+
+class OutputStore:
+    """
+    Managed artifact directory, served under ``url_prefix``.
+
+    Renderers write to a ``temp_path()`` and hand the file to ``adopt()``,
+    which renames it to ``<prefix>_<content hash><ext>``, so identical
+    artifacts are stored once. ``sweep()`` removes files not written or
+    touched for ``ttl_sec`` and then the least recently used ones (by mtime)
+    until the directory fits in ``max_bytes``. Only temp files and names
+    ``adopt()`` produces are ever removed. It is safe to call from any
+    process sharing the directory.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 512 << 20, ttl_sec: float = 86400,
+                 url_prefix: str = "/outputs/store"):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        self.max_bytes = int(max_bytes)
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stop = threading.Event()
+        self.writes = 0
+        self.dedup_hits = 0
+        self.evicted_ttl = 0
+        self.evicted_size = 0
+        self.evicted_bytes = 0
+        self.sweeps = 0
+        self.last_sweep = None
+        os.makedirs(root, exist_ok=True)
+
+    # ---------- write ----------
+    def temp_path(self, ext: str = ".png") -> str:
+        return os.path.join(self.root, f"{_TMP_PREFIX}{uuid4().hex}{ext}")
+
+    def adopt(self, tmp_path: str, prefix: str) -> str:
+        """Move a finished temp file to its content-addressed name; returns its /outputs URL."""
+        h = hashlib.sha256()
+        with open(tmp_path, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_CHUNK), b""):
+                h.update(block)
+        ext = os.path.splitext(tmp_path)[1]
+        name = f"{prefix}_{h.hexdigest()[:32]}{ext}"
+        path = os.path.join(self.root, name)
+
+        if self.touch(name):
+            os.remove(tmp_path)
+            with self._lock:
+                self.dedup_hits += 1
+        else:
+            # not there, or swept since the last render: (re)materialize it
+            os.replace(tmp_path, path)
+            with self._lock:
+                self.writes += 1
+        return f"{self.url_prefix}/{name}"
+
+    def touch(self, name: str) -> bool:
+        """Mark an artifact as recently used; False if it is gone."""
+        try:
+            os.utime(os.path.join(self.root, os.path.basename(name)))
+            return True
+        except OSError:
+            return False
+
+    # ---------- eviction ----------
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.root):
+            if not (entry.name.startswith(_TMP_PREFIX) or _ARTIFACT_RE.match(entry.name)):
+                continue  # not ours
+            try:
+                if entry.is_file():
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path, entry.name))
+            except OSError:
+                continue
+        return entries
+
+    def sweep(self) -> dict:
+        """Apply the TTL, then the byte cap (oldest first). Returns what was removed."""
+        now = time.time()
+        entries = sorted(self._entries())
+        total = sum(e[1] for e in entries)
+        removed_ttl, removed_size, removed_bytes = 0, 0, 0
+
+        for mtime, size, path, name in entries:
+            expired = self.ttl_sec is not None and now - mtime > self.ttl_sec
+            if not expired:
+                if total <= self.max_bytes:
+                    break
+                if name.startswith(_TMP_PREFIX):
+                    continue  # a render may still be writing it
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed_bytes += size
+            if expired:
+                removed_ttl += 1
+            else:
+                removed_size += 1
+
+        with self._lock:
+            self.evicted_ttl += removed_ttl
+            self.evicted_size += removed_size
+            self.evicted_bytes += removed_bytes
+            self.sweeps += 1
+            self.last_sweep = now
+        return {"ttl": removed_ttl, "size": removed_size, "bytes": removed_bytes}
+
+    def start_sweeper(self, interval_sec: float):
+        """Run ``sweep()`` now and then every ``interval_sec`` in a daemon thread."""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while True:
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print("⚠️ Output sweep failed:", e)
+                if self._stop.wait(interval_sec):
+                    return
+
+        self._sweeper = threading.Thread(target=loop, name="output-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        with self._lock:
+            return {
+                "files": len(entries),
+                "bytes": sum(e[1] for e in entries),
+                "max_bytes": self.max_bytes,
+                "ttl_sec": self.ttl_sec,
+                "writes": self.writes,
+                "dedup_hits": self.dedup_hits,
+                "evicted_ttl": self.evicted_ttl,
+                "evicted_size": self.evicted_size,
+                "evicted_bytes": self.evicted_bytes,
+                "sweeps": self.sweeps,
+                "last_sweep": self.last_sweep,
+            }
+
+
+def get_output_store() -> OutputStore:
+    """Process-wide output store, created on first use."""
+    global _OUTPUT_STORE
+    if _OUTPUT_STORE is None:
+        _OUTPUT_STORE = OutputStore(OUTPUT_STORE_DIR, max_bytes=OUTPUT_MAX_BYTES, ttl_sec=OUTPUT_TTL_SEC)
+    return _OUTPUT_STORE
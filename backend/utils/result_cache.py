@@ -0,0 +1,136 @@
+# utils/result_cache.py
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+CACHE_VERSION = 1
+
+
+class ResultCache:
+    """
+    Content-addressed cache of /predict responses.
+
+    Keys are built by the caller from the upload's content hash, the model
+    checkpoint hash and the preprocessing config, so a new ``best.pt`` or a
+    config change simply stops matching old entries. Entries live in a small
+    in-memory LRU in front of ``<key>.json`` files on disk; the disk side keeps
+    at most ``max_entries`` files, least recently used (by mtime) evicted first.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 1024, memory_entries: int = 128):
+        self.cache_dir = cache_dir
+        self.max_entries = int(max_entries)
+        self.memory_entries = int(memory_entries)
+        self._memory = OrderedDict()  # key -> result dict
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stale = 0  # entries dropped because a referenced file is gone
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        return hashlib.sha256(repr((CACHE_VERSION,) + parts).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".json")
+
+    # ---------- get / put ----------
+    def get(self, key: str, validate=None) -> Optional[dict]:
+        """
+        Stored result for ``key`` or None. ``validate(result) -> bool`` lets the
+        caller reject entries whose artifacts (e.g. the heatmap PNG) are gone.
+        """
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+        source = "memory"
+
+        if result is None:
+            path = self._path(key)
+            try:
+                with open(path, "r") as f:
+                    result = json.load(f)
+                os.utime(path)  # LRU touch
+            except (OSError, ValueError):
+                with self._lock:
+                    self.misses += 1
+                return None
+            source = "disk"
+
+        if validate is not None and not validate(result):
+            self.discard(key)
+            with self._lock:
+                self.stale += 1
+                self.misses += 1
+            return None
+
+        with self._lock:
+            if source == "memory":
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+                self._remember(key, result)
+        return dict(result)
+
+    def put(self, key: str, result: dict):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._remember(key, dict(result))
+        self.evict()
+
+    def discard(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _remember(self, key: str, result: dict):
+        # caller holds self._lock
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # ---------- eviction ----------
+    def _disk_entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                entries.append((os.stat(os.path.join(self.cache_dir, name)).st_mtime_ns, name[:-5]))
+            except OSError:
+                continue
+        return entries
+
+    def evict(self):
+        """Drop least recently used disk entries beyond ``max_entries``."""
+        entries = sorted(self._disk_entries())
+        for _, key in entries[:max(0, len(entries) - self.max_entries)]:
+            self.discard(key)
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._disk_entries()),
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,121 @@
+# utils/stream_protocol.py
+"""
+Wire formats of /ws/stream.
+
+"json" (default) is the original text frame, a (ch, n) nested list per chunk.
+The binary formats send one WebSocket binary message per chunk:
+
+    header  <BBHIfIf   20 bytes, little endian
+            version u8, dtype u8 (1 = float32, 2 = int16), n_channels u16,
+            seq u32, fs f32 (after decimation), n_samples u32, scale f32
+    payload n_channels x n_samples, channel-major, little endian
+
+int16 samples are ``round(x / scale)`` with a per-chunk scale (max finite |x|
+maps to 32767); NaN and ±inf are sent as -32768, which rounding never
+produces, and decode to NaN. float32 frames carry scale 1.0 and send
+non-finite samples as they are. A client asks for a format at
+connect time, either ``/ws/stream?format=i16&decimate=2`` or by offering the
+subprotocol ``eeg.i16`` / ``eeg.f32``. Anything unknown falls back to JSON.
+A binary session starts with one JSON text frame describing the format.
+"""
+import struct
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from preprocessing.filters import StreamingDecimator
+
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct("<BBHIfIf")
+DTYPE_CODES = {"f32": 1, "i16": 2}
+SUBPROTOCOLS = {"eeg." + name: name for name in DTYPE_CODES}
+MAX_DECIMATE = 16
+_INT16_MAX = 32767
+_INT16_NONFINITE = -32768  # int16 code of a NaN / inf sample
+
+
+class StreamFormat:
+    """What a client negotiated: ``kind`` ("json", "f32", "i16") and a decimation factor."""
+
+    def __init__(self, kind: str = "json", decimate: int = 1, subprotocol: Optional[str] = None):
+        self.kind = kind
+        self.decimate = decimate
+        self.subprotocol = subprotocol  # to echo in the handshake, if one was picked
+
+    @property
+    def binary(self) -> bool:
+        return self.kind in DTYPE_CODES
+
+    def hello(self) -> dict:
+        """First (text) frame of a binary session."""
+        return {
+            "protocol": "eeg-stream", "version": PROTOCOL_VERSION, "format": self.kind,
+            "decimate": self.decimate, "header": HEADER.format,
+            "fields": ["version", "dtype", "n_channels", "seq", "fs", "n_samples", "scale"],
+        }
+
+
+def negotiate(params, subprotocols: Iterable[str] = ()) -> StreamFormat:
+    """StreamFormat from the query parameters and offered subprotocols; JSON when nothing valid is asked."""
+    try:
+        decimate = min(max(int(params.get("decimate", 1)), 1), MAX_DECIMATE)
+    except (TypeError, ValueError):
+        decimate = 1
+    for proto in subprotocols:
+        if proto in SUBPROTOCOLS:
+            return StreamFormat(SUBPROTOCOLS[proto], decimate, subprotocol=proto)
+    kind = str(params.get("format", "json")).lower()
+    return StreamFormat(kind if kind in DTYPE_CODES else "json", decimate)
+
+
+def encode_frame(chunk: np.ndarray, seq: int, fs: float, kind: str) -> bytes:
+    """One binary frame for a (ch, n) chunk."""
+    chunk = np.asarray(chunk)
+    if kind == "i16":
+        finite = np.isfinite(chunk)
+        peak = float(np.abs(chunk, where=finite, out=np.zeros(chunk.shape)).max()) if chunk.size else 0.0
+        scale = peak / _INT16_MAX if peak > 0 else 1.0
+        payload = np.rint(np.where(finite, chunk, 0) / scale).astype("<i2")
+        payload[~finite] = _INT16_NONFINITE
+    else:
+        scale = 1.0
+        payload = chunk.astype("<f4", copy=False)
+    n_channels, n_samples = chunk.shape
+    header = HEADER.pack(PROTOCOL_VERSION, DTYPE_CODES[kind], n_channels, seq & 0xFFFFFFFF,
+                         fs, n_samples, scale)
+    return header + np.ascontiguousarray(payload).tobytes()
+
+
+def decode_frame(frame: bytes) -> Tuple[dict, np.ndarray]:
+    """Inverse of ``encode_frame``: (header fields, float32 (ch, n) samples)."""
+    version, code, n_channels, seq, fs, n_samples, scale = HEADER.unpack_from(frame)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported stream frame version: {version}")
+    dtype = "<i2" if code == DTYPE_CODES["i16"] else "<f4"
+    x = np.frombuffer(frame, dtype=dtype, offset=HEADER.size).reshape(n_channels, n_samples)
+    if code == DTYPE_CODES["i16"]:
+        x = np.where(x == _INT16_NONFINITE, np.float32(np.nan), x.astype(np.float32) * np.float32(scale))
+    header = {"seq": seq, "fs": fs, "n_channels": n_channels, "n_samples": n_samples, "scale": scale}
+    return header, x
+
+
+class StreamSession:
+    """Per-connection encoder: decimation state and frame sequence number for one client."""
+
+    def __init__(self, fmt: StreamFormat):
+        self.format = fmt
+        self.seq = 0
+        self._decimator = None
+
+    def encode(self, chunk: np.ndarray, fs: float):
+        """Next message for ``chunk`` (ch, n) at ``fs``: bytes for binary formats, a nested list for JSON."""
+        if self.format.decimate > 1:
+            if self._decimator is None:
+                self._decimator = StreamingDecimator(fs, self.format.decimate)
+            chunk, fs = self._decimator.process(chunk), self._decimator.fs_out
+        if self.format.binary:
+            msg = encode_frame(chunk, self.seq, fs, self.format.kind)
+        else:
+            msg = chunk.tolist()
+        self.seq += 1
+        return msg
@@ -1,41 +1,47 @@
 # utils/stream_utils.py
 import numpy as np
 import asyncio
-from preprocessing.loader import load_eeg
+import itertools
+from preprocessing.loader import iter_eeg_chunks
+from preprocessing.filters import FilterBank
 
 async def eeg_data_generator(fs: int = 256, duration: int = 10):
-    """Simulated EEG generator (fallback)."""
+    """Simulated EEG generator (fallback). Yields ``(chunk (ch, n), fs)``."""
     n_channels = 16
     chunk_size = int(fs / 2)  
 
     for _ in range(int(duration * 2)):
         t = np.linspace(0, 0.5, chunk_size, endpoint=False)
-        signals = []
-        for ch in range(n_channels):
-            freq = np.random.choice([6, 10, 18])
-            sig = np.sin(2 * np.pi * freq * t) + 0.1 * np.random.randn(chunk_size)
-            signals.append(sig.tolist())
-        yield signals
+        freqs = np.random.choice([6, 10, 18], size=(n_channels, 1))
+        signals = np.sin(2 * np.pi * freqs * t) + 0.1 * np.random.randn(n_channels, chunk_size)
+        yield signals, fs
         await asyncio.sleep(0.5)
 
-async def eeg_file_stream(file_path: str, fs: int = 256, duration: int = 10):
-    """Stream EEG data from an uploaded file chunk by chunk."""
+async def eeg_file_stream(file_path: str, fs: int = 256, duration: int = 10,
+                          notch: float = None, band: tuple = None):
+    """
+    Stream EEG data from an uploaded file chunk by chunk, as ``(chunk (ch, n), fs)``.
+    If ``band`` is given, chunks are filtered causally on the fly (state carried across chunks).
+    """
+    chunks = iter_eeg_chunks(file_path, chunk_sec=0.5, fs_fallback=fs)
     try:
-        x, fs_loaded, _ = load_eeg(file_path, fs_fallback=fs)
-        if fs_loaded:
-            fs = fs_loaded
+        first = next(chunks, None)
     except Exception as e:
         print("⚠️ Could not load EEG file for streaming:", e)
         return
+    if first is None:
+        return
 
-    n_channels, n_samples = x.shape
+    _, fs_loaded, _ = first
+    if fs_loaded:
+        fs = fs_loaded
     chunk_size = int(fs / 2)
+    live_filter = FilterBank(fs, notch, band).stream() if band else None
 
-    for start in range(0, n_samples, chunk_size):
-        end = start + chunk_size
-        if end > n_samples:
+    for chunk, _, _ in itertools.chain([first], chunks):
+        if chunk.shape[1] < chunk_size:
             break
-        chunk = x[:, start:end].tolist()
-        yield chunk
+        if live_filter is not None:
+            chunk = live_filter.process(chunk)
+        yield chunk, fs
         await asyncio.sleep(0.5)   # mimic real-time pace
-
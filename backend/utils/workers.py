@@ -0,0 +1,59 @@
+# utils/workers.py
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+def make_executor(kind: str, workers: int, initializer=None, initargs=()):
+    """
+    Worker pool for CPU-bound request work.
+    "thread": shares the process' models (torch and numpy release the GIL in kernels);
+    "process": fully parallel, each worker loads its own models via ``initializer(*initargs)``.
+    """
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="predict")
+    if kind == "process":
+        # spawn, not fork: the parent already runs torch / batching threads
+        ctx = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                   initializer=initializer, initargs=initargs)
+    raise ValueError(f"Unknown executor kind: {kind}")
+
+
+class InflightLimiter:
+    """
+    Bounded admission for work handed to a pool: at most ``limit`` requests
+    queued or running. Used from the event loop only, so no locking is needed.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.inflight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def try_acquire(self) -> bool:
+        if self.inflight >= self.limit:
+            self.rejected += 1
+            return False
+        self.inflight += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.inflight -= 1
+
+    async def run(self, executor, fn, *args):
+        """Run ``fn(*args)`` in ``executor``; the caller must have acquired a slot."""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "limit": self.limit,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
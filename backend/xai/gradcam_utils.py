@@ -1,10 +1,22 @@
 # xai/gradcam_utils.py
+import threading
+
 import numpy as np
-import matplotlib.pyplot as plt
 import torch
 import torch.nn as nn
-from pytorch_grad_cam import GradCAM
-from pytorch_grad_cam.utils.model_targets import ClassifierOutputTarget
+
+from .heatmap_render import render_heatmap_png
+
+
+def load_gradcam():
+    """
+    (GradCAM, ClassifierOutputTarget), imported on first use: pytorch_grad_cam
+    pulls in torchvision and matplotlib, about two seconds of server start-up.
+    """
+    from pytorch_grad_cam import GradCAM
+    from pytorch_grad_cam.utils.model_targets import ClassifierOutputTarget
+    return GradCAM, ClassifierOutputTarget
+
 
 def find_last_conv(model: torch.nn.Module):
     """Find the last Conv1d/Conv2d layer in the model."""
@@ -13,68 +25,102 @@ def find_last_conv(model: torch.nn.Module):
         raise RuntimeError("No Conv layer found for Grad-CAM target")
     return convs[-1]
 
-def generate_gradcam(model, device, input_tensor, target_class, out_path, ch_names=None, fs=256):
+# GradCAM hooks the explainer model's target layer (ModelRegistry.get_explainer,
+# never the inference instance), so concurrent heatmaps must take turns on it
+_GRADCAM_LOCK = threading.Lock()
+
+
+def normalize_cams(cams: np.ndarray) -> np.ndarray:
+    """Scale each (F, T) CAM of a (B, F, T) stack to 0–1."""
+    lo = cams.min(axis=(1, 2), keepdims=True)
+    hi = cams.max(axis=(1, 2), keepdims=True)
+    return (cams - lo) / (hi - lo + 5e-6)
+
+
+def compute_cams(model, input_tensor, target_class, batched=True) -> np.ndarray:
+    """
+    Normalized Grad-CAM for every window of ``input_tensor`` (B, C, F, T) -> (B, F, T).
+
+    ``batched=True`` registers the hooks once and runs one forward/backward pass
+    over all windows; ``batched=False`` is the original one-GradCAM-per-window loop,
+    kept as the reference for scripts/bench_gradcam.py.
+    """
+    GradCAM, ClassifierOutputTarget = load_gradcam()
+    model.eval()
+    target_layer = find_last_conv(model)
+
+    with _GRADCAM_LOCK:
+        if batched:
+            with GradCAM(model=model, target_layers=[target_layer]) as cam:
+                targets = [ClassifierOutputTarget(target_class)] * input_tensor.shape[0]
+                cams = cam(input_tensor=input_tensor, targets=targets)
+        else:
+            cams = []
+            for i in range(input_tensor.shape[0]):
+                cam = GradCAM(model=model, target_layers=[target_layer])
+                targets = [ClassifierOutputTarget(target_class)]
+                cams.append(cam(input_tensor=input_tensor[i:i+1], targets=targets)[0])
+            cams = np.stack(cams)
+
+    return normalize_cams(cams)
+
+
+def plot_gradcam_figure(avg_cam, base_img, out_path, ch_names=None, fs=256):
+    """Annotated matplotlib version of the heatmap (axes, ticks, colorbar, title)."""
+    from matplotlib.figure import Figure  # only needed for annotated heatmaps
+
+    # Figure API, not pyplot: no global state shared between worker threads
+    fig = Figure(figsize=(10, 4))
+    ax = fig.subplots()
+    time_axis = np.linspace(0, base_img.shape[-1] / fs, base_img.shape[-1])
+    freq_axis = np.arange(base_img.shape[0])
+
+    im = ax.imshow(
+        avg_cam,
+        aspect="auto",
+        cmap="turbo",
+        origin="lower",
+        extent=[time_axis.min(), time_axis.max(), freq_axis.min(), freq_axis.max()]
+    )
+    fig.colorbar(im, ax=ax, label="Activation Intensity")
+    ax.set_xlabel("Time (s)")
+    if ch_names is not None and len(ch_names) == avg_cam.shape[0]:
+        ax.set_yticks(range(len(ch_names)), ch_names)
+        ax.set_ylabel("Channels")
+    else:
+        ax.set_ylabel("Frequency / Channels")
+
+    ax.set_title("EEG Grad-CAM (averaged across windows)")
+    fig.tight_layout()
+    fig.savefig(out_path, dpi=150, bbox_inches="tight")
+
+
+def generate_gradcam(model, device, input_tensor, target_class, out_path, ch_names=None, fs=256,
+                     annotate=False):
     """
     Generate Grad-CAM heatmap for one or multiple windows.
     If multiple windows are passed, it averages them for stability.
+    ``annotate=True`` draws axes/ticks/colorbar with matplotlib; otherwise the
+    bare heatmap goes through the fast LUT renderer.
     """
     explanation = "No explanation available."
     heatmap_path = None
 
     try:
-        model.eval()
-        target_layer = find_last_conv(model)
-
         # Handle single window case
-        if input_tensor.ndim == 5:  
+        if input_tensor.ndim == 3:
             input_tensor = input_tensor.unsqueeze(0)  # (1, C, F, T)
 
-        heatmaps = []
-        for i in range(input_tensor.shape[0]):
-            cam = GradCAM(model=model, target_layers=[target_layer])
-            targets = [ClassifierOutputTarget(target_class)]
-            grayscale_cam = cam(input_tensor=input_tensor[i:i+1], targets=targets)[0]
-
-            # Normalize CAM (0–1)
-            grayscale_cam = (grayscale_cam - np.min(grayscale_cam)) / (
-                np.max(grayscale_cam) - np.min(grayscale_cam) + 5e-6
-            )
-            heatmaps.append(grayscale_cam)
-
         # Average across windows
-        avg_cam = np.mean(heatmaps, axis=0)
+        avg_cam = compute_cams(model, input_tensor, target_class).mean(axis=0)
 
-        # Background (spectrogram for plotting)
-        spec = input_tensor[0].cpu().numpy()
-        if spec.ndim == 3:
-            base_img = np.mean(spec, axis=0)
-        else:
-            base_img = spec
-
-        # Plot heatmap
-        plt.figure(figsize=(10, 4))
-        time_axis = np.linspace(0, base_img.shape[-1] / fs, base_img.shape[-1])
-        freq_axis = np.arange(base_img.shape[0])
-
-        im = plt.imshow(
-            avg_cam,
-            aspect="auto",
-            cmap="turbo",
-            origin="lower",
-            extent=[time_axis.min(), time_axis.max(), freq_axis.min(), freq_axis.max()]
-        )
-        plt.colorbar(im, label="Activation Intensity")
-        plt.xlabel("Time (s)")
-        if ch_names is not None and len(ch_names) == avg_cam.shape[0]:
-            plt.yticks(range(len(ch_names)), ch_names)
-            plt.ylabel("Channels")
+        if annotate:
+            # Background (spectrogram for plotting)
+            spec = input_tensor[0].cpu().numpy()
+            base_img = np.mean(spec, axis=0) if spec.ndim == 3 else spec
+            plot_gradcam_figure(avg_cam, base_img, out_path, ch_names=ch_names, fs=fs)
         else:
-            plt.ylabel("Frequency / Channels")
-
-        plt.title("EEG Grad-CAM (averaged across windows)")
-        plt.tight_layout()
-        plt.savefig(out_path, dpi=150, bbox_inches="tight")
-        plt.close()
+            render_heatmap_png(avg_cam, out_path, origin="lower")
         heatmap_path = out_path
 
         explanation = "EEG Grad-CAM averaged across windows for more stable visualization."
@@ -0,0 +1,80 @@
+# xai/heatmap_render.py
+"""
+matplotlib-free heatmap PNGs: min-max scale, turbo colormap through a 256-entry
+uint8 lookup table, nearest-neighbour upscale and a hand-rolled PNG encoder.
+No axes, ticks or colorbar; the annotated matplotlib figures stay available
+through ``annotate=True`` in generate_gradcam / render_csv_heatmap.
+"""
+import zlib
+import struct
+
+import numpy as np
+
+DEFAULT_SIZE = (1000, 400)  # (width, height) in pixels
+PNG_COMPRESSION = 3         # zlib level: nearest-upscaled heatmaps compress well even when low
+
+
+# matplotlib's "turbo" sampled at 256 points, as RGB bytes (keeps matplotlib out of the import)
+_TURBO_HEX = (
+    "30123b32154333184a341b51351e5836215f37246638276d392a733a2d793b2f803c32863d358b3e38913f3b973f3e9c"
+    "4040a24143a74146ac4249b1424bb5434eba4451bf4454c34456c74559cb455ccf455ed34661d64664da4666dd4669e0"
+    "466be3476ee64771e94773eb4776ee4778f0477bf2467df44680f64682f84685fa4687fb458afc458cfd448ffe4391fe"
+    "4294ff4196ff4099ff3e9bfe3d9efe3ba0fd3aa3fc38a5fb37a8fa35abf833adf731aff52fb2f42eb4f22cb7f02ab9ee"
+    "28bceb27bee925c0e723c3e422c5e220c7df1fc9dd1ecbda1ccdd81bd0d51ad2d21ad4d019d5cd18d7ca18d9c818dbc5"
+    "18ddc218dec018e0bd19e2bb19e3b91ae4b61ce6b41de7b21fe9af20eaac22ebaa25eca727eea42aefa12cf09e2ff19b"
+    "32f29835f39438f4913cf58e3ff68a43f78746f8844af8804ef97d52fa7a55fa7659fb735dfc6f61fc6c65fd6969fd66"
+    "6dfe6271fe5f75fe5c79fe597dff5680ff5384ff5188ff4e8bff4b8fff4992ff4796fe4499fe429cfe409ffd3fa1fd3d"
+    "a4fc3ca7fc3aa9fb39acfb38affa37b1f936b4f836b7f735b9f635bcf534bef434c1f334c3f134c6f034c8ef34cbed34"
+    "cdec34d0ea34d2e935d4e735d7e535d9e436dbe236dde037dfdf37e1dd37e3db38e5d938e7d739e9d539ebd339ecd13a"
+    "eecf3aefcd3af1cb3af2c93af4c73af5c53af6c33af7c13af8be39f9bc39faba39fbb838fbb637fcb336fcb136fdae35"
+    "fdac34fea933fea732fea431fea130fe9e2ffe9b2dfe992cfe962bfe932afe9029fd8d27fd8a26fc8725fc8423fb8122"
+    "fb7e21fa7b1ff9781ef9751df8721cf76f1af66c19f56918f46617f36315f26014f15d13f05b12ef5811ed5510ec530f"
+    "eb500eea4e0de84b0ce7490ce5470be4450ae2430ae14109df3f08dd3d08dc3b07da3907d83706d63506d43305d23105"
+    "d02f05ce2d04cc2b04ca2a04c82803c52603c32503c12302be2102bc2002b91e02b71d02b41b01b21a01af1801ac1701"
+    "a91601a71401a41301a112019e10019b0f01980e01950d01920b018e0a018b09028808028507028106027e05027a0403"
+)
+TURBO_LUT = np.frombuffer(bytes.fromhex(_TURBO_HEX), dtype=np.uint8).reshape(256, 3)
+
+
+def _chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+def encode_png(rgb: np.ndarray, level: int = PNG_COMPRESSION) -> bytes:
+    """Encode an (H, W, 3) uint8 image as an 8-bit RGB PNG."""
+    h, w, _ = rgb.shape
+    raw = np.empty((h, 1 + 3 * w), dtype=np.uint8)
+    raw[:, 0] = 0  # filter type "None" on every scanline
+    raw[:, 1:] = rgb.reshape(h, 3 * w)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0))
+        + _chunk(b"IDAT", zlib.compress(raw.tobytes(), level))
+        + _chunk(b"IEND", b"")
+    )
+
+
+def colorize(values: np.ndarray, size=DEFAULT_SIZE, origin: str = "lower") -> np.ndarray:
+    """
+    (H0, W0) values -> (height, width, 3) uint8 turbo image, scaled to the data's
+    min/max like ``imshow``. ``origin="lower"`` puts row 0 at the bottom.
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=np.float32))
+    lo, hi = float(values.min()), float(values.max())
+    scaled = (values - lo) / (hi - lo) if hi > lo else np.zeros_like(values)
+    idx = np.round(scaled * 255).astype(np.uint8)
+    if origin == "lower":
+        idx = idx[::-1]
+
+    width, height = size
+    rows = np.arange(height) * idx.shape[0] // height
+    cols = np.arange(width) * idx.shape[1] // width
+    return TURBO_LUT[idx[rows[:, None], cols[None, :]]]
+
+
+def render_heatmap_png(values: np.ndarray, out_path: str, size=DEFAULT_SIZE, origin: str = "lower") -> str:
+    """Write ``values`` as a turbo heatmap PNG to ``out_path`` and return the path."""
+    png = encode_png(colorize(values, size=size, origin=origin))
+    with open(out_path, "wb") as f:
+        f.write(png)
+    return out_path